@@ -6,10 +6,50 @@ def addcrawlerclisubparsers(p):
     sub.add_argument("--sites", nargs="*", help="List of sites e.g., cnn.com webmd.com")
     sub.add_argument("--urls-csv", dest="urlcsv", required=False, help="CSV with columns: website,url")
     sub.add_argument("--store-html", action="store_true", help="Store raw HTML to S3/object storage")
+    sub.add_argument("--concurrency", type=int, default=1,
+                     help="Max pages in flight overall; 1 crawls sequentially")
+    sub.add_argument("--per-host", dest="perhost", type=int, default=2,
+                     help="Max pages in flight per host when --concurrency > 1")
+    sub.add_argument("--min-age", dest="minage", type=float, default=None,
+                     help="Skip sites crawled within this many hours")
+    sub.add_argument("--extractor", default="readability", choices=["readability", "fast"],
+                     help="Text extractor: readability (default) or single-pass lxml 'fast'")
+    sub.add_argument("--parse-workers", dest="parseworkers", type=int, default=None,
+                     help="Parse processes when --concurrency > 1 (default: all cores; 0 parses inline)")
+    sub.add_argument("--write-batch", dest="writebatch", type=int, default=500,
+                     help="Crawl rows per batched DB write in the split fetch/parse mode")
+    sub.add_argument("--sitemap-sample", dest="sitemapsample", type=int, default=0,
+                     help="Sample up to N pages per site from its sitemaps and crawl those URLs")
+    sub.add_argument("--sample-out", dest="sampleout", default=None,
+                     help="With --sitemap-sample, also write the sampled website,url CSV here")
+    sub.add_argument("--enqueue", action="store_true",
+                     help="Add the given sites/URLs to the crawlqueue table instead of crawling them")
+    sub.add_argument("--worker", action="store_true",
+                     help="Lease batches from crawlqueue and crawl them until the queue is drained")
+    sub.add_argument("--worker-id", dest="workerid", default=None,
+                     help="Lease owner name (default: hostname-pid)")
+    sub.add_argument("--lease-batch", dest="leasebatch", type=int, default=500,
+                     help="Jobs leased per batch in --worker mode")
+    sub.add_argument("--lease-seconds", dest="leaseseconds", type=float, default=1800.0,
+                     help="Lease duration; unfinished jobs of a dead worker are re-leased after this")
+    sub.add_argument("--max-attempts", dest="maxattempts", type=int, default=3,
+                     help="Attempts per queued job before it is marked FAILED")
+    sub.add_argument("--poll", dest="poll", type=float, default=0.0,
+                     help="In --worker mode, wait this many seconds for new jobs instead of exiting when empty")
 
 def handlecrawlerargs(args):
     import pandas as pd
-    from .service import crawl_sites, crawl_site_urls
+    from .service import (
+        crawl_sites, crawl_site_urls, enqueue_sites, enqueue_site_urls, run_crawl_worker, sitemap_sample_urls,
+    )
+    if args.worker:
+        run_crawl_worker(worker_id=args.workerid, lease_batch=args.leasebatch,
+                         lease_seconds=args.leaseseconds, max_attempts=args.maxattempts,
+                         poll_seconds=args.poll, store_html=args.store_html,
+                         concurrency=args.concurrency, per_host=args.perhost,
+                         min_age_hours=args.minage, extractor=args.extractor,
+                         parse_workers=args.parseworkers, write_batch=args.writebatch)
+        return
     sites = []
     if args.inpath:
         df = pd.read_csv(args.inpath)
@@ -17,12 +57,33 @@ def handlecrawlerargs(args):
             sites = [str(x).strip().lower() for x in df["website"].tolist() if str(x).strip()]
     if args.sites:
         sites.extend([s.strip().lower() for s in args.sites if s.strip()])
-    if args.urlcsv:
+    if args.sitemapsample > 0:
+        if not sites:
+            raise SystemExit("--sitemap-sample needs sites via --in or --sites")
+        dfu = sitemap_sample_urls(sites, args.sitemapsample, concurrency=max(16, args.concurrency))
+        if args.sampleout:
+            dfu.to_csv(args.sampleout, index=False)
+    elif args.urlcsv:
         dfu = pd.read_csv(args.urlcsv)
         if not {"website", "url"}.issubset(dfu.columns):
             raise SystemExit("urls-csv must contain columns: website,url")
-        crawl_site_urls(dfu, store_html=args.store_html)
+    else:
+        dfu = None
+    if dfu is not None:
+        if args.enqueue:
+            enqueue_site_urls(dfu)
+            return
+        crawl_site_urls(dfu, store_html=args.store_html,
+                        concurrency=args.concurrency, per_host=args.perhost,
+                        min_age_hours=args.minage, extractor=args.extractor,
+                        parse_workers=args.parseworkers, write_batch=args.writebatch)
         return
     if not sites:
         raise SystemExit("No sites provided. Use --in, --sites, or --urls-csv")
-    crawl_sites(sites, source="manual", store_html=args.store_html)
\ No newline at end of file
+    if args.enqueue:
+        enqueue_sites(sites, source="manual")
+        return
+    crawl_sites(sites, source="manual", store_html=args.store_html,
+                concurrency=args.concurrency, per_host=args.perhost,
+                min_age_hours=args.minage, extractor=args.extractor,
+                parse_workers=args.parseworkers, write_batch=args.writebatch)
\ No newline at end of file
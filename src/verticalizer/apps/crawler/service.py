@@ -2,96 +2,322 @@
 
 import hashlib
 import logging
-from typing import List
+import os
+import socket
+import time
+from functools import partial
+from typing import Any, Dict, List, Optional, Tuple
 import pandas as pd
 
-from ...crawl.fetcher import fetch_text
-from ...storage.repositories import create_tables_if_missing, record_crawl, upsert_site
+from ...crawl.engine import (
+    OK, ERROR, UNCHANGED, CrawlStats, crawl_concurrently, crawl_pipelined, crawl_sequentially,
+)
+from ...crawl.fetcher import fetch_page, fetch_stats
+from ...crawl.parse import MAX_CHARS, parse_html
+from ...crawl.robots import robots_cache_stats
+from ...crawl.sitemap import sample_sites
+from ...storage.repositories import (
+    complete_crawl_jobs,
+    crawl_queue_counts,
+    create_tables_if_missing,
+    enqueue_crawl_jobs,
+    fail_crawl_jobs,
+    get_validators_many,
+    lease_crawl_jobs,
+    sites_crawled_within,
+)
+from ...storage.writer import CrawlWriter
 
 logger = logging.getLogger(__name__)
 
+EXCERPT_CHARS = 4000  # text kept per crawl row
+
 def _sha256(s: str) -> str:
     return hashlib.sha256((s or "").encode("utf-8", errors="ignore")).hexdigest()
 
-def crawl_sites(sites: List[str], source: str = "batch", store_html: bool = False):
-    from ...storage.s3 import putbytes
-    create_tables_if_missing()
-    for site in sites:
-        try:
-            upsert_site(site)
-            text, html, status, lang = fetch_text(site, return_html=True)  # returns tuple
-            excerpt = (text or "")[:4000]
-            content_hash = _sha256(text or html or "")
-            htmlkey = None
-            if store_html and html:
-                htmlkey = f"raw-html/{site}/{content_hash}.html"
-                putbytes(htmlkey, (html or "").encode("utf-8", errors="ignore"), "text/html; charset=utf-8")
-            record_crawl(
-                site=site,
-                url=f"https://{site}",
-                httpstatus=int(status or 0),
-                contenthash=content_hash,
-                textexcerpt=excerpt,
-                textfullref=htmlkey or "",
-                lang=lang or "en",
-                source=source,
-                status="OK" if status and 200 <= int(status) < 400 else "ERROR",
-            )
-        except Exception as e:
-            logger.exception("crawler Failed %s: %s", site, e)
-            record_crawl(
-                site=site,
-                url=f"https://{site}",
-                httpstatus=0,
-                contenthash="",
-                textexcerpt="",
-                textfullref="",
-                lang="",
-                source=source,
-                status="ERROR",
-            )
+def _parser(extractor: str):
+    # The fast extractor stops at the excerpt budget, so its content hash covers
+    # only the stored excerpt.
+    return partial(parse_html, extractor=extractor,
+                   max_chars=EXCERPT_CHARS if extractor == "fast" else MAX_CHARS)
+
+def _error_row(site: str, url: str, source: str) -> Dict[str, Any]:
+    return dict(
+        site=site,
+        url=url,
+        httpstatus=0,
+        contenthash="",
+        textexcerpt="",
+        textfullref="",
+        lang="",
+        source=source,
+        status="ERROR",
+    )
 
-def crawl_site_urls(df_urls: pd.DataFrame, store_html: bool = False):
+def _fetch_stage(site: str, url: str, source: str, store_html: bool, writer: CrawlWriter,
+                 validators: Dict[str, Dict[str, Optional[str]]]):
     """
-    Crawl per (website,url) row for multi-URL site aggregation.
+    Conditional fetch without parsing, using validators prefetched for the batch
+    (get_validators_many), so fetch threads never wait on the database. A 304 is settled here (cheap unchanged
+    marker, no crawls row); otherwise returns (context, html) where html is None
+    unless the page is a 2xx HTML body that needs parsing. The context carries the
+    raw HTML only when store_html is set.
     """
-    from ...storage.s3 import putbytes
+    try:
+        writer.add_site(site)
+        prev = validators.get(url) or {}
+        res = fetch_page(url, return_html=True, etag=prev.get("etag"),
+                         last_modified=prev.get("lastmodified"), parse=False)
+        if res.not_modified and prev:
+            writer.mark_unchanged(site, url)
+            return UNCHANGED
+        # Only keep the body in ctx when it is uploaded later; pages that are not
+        # parsed are hashed here so the raw body can be dropped right away.
+        ctx = {
+            "site": site, "url": url, "source": source, "store_html": store_html,
+            "prevhash": prev.get("contenthash"), "status": res.status, "lang": res.lang,
+            "etag": res.etag, "lastmodified": res.last_modified,
+            "html": res.html if store_html else None,
+            "bodyhash": None if res.is_html else _sha256(res.html or ""),
+        }
+        return ctx, (res.html if res.is_html else None)
+    except Exception as e:
+        logger.exception("crawler Failed %s %s: %s", site, url, e)
+        writer.add_crawl(_error_row(site, url, source))
+        return ERROR
+
+def _persist_stage(items: List[Tuple[Dict[str, Any], Any]], writer: CrawlWriter) -> List[str]:
+    """
+    Persist a batch of parsed pages: raw HTML (optional) uploaded in parallel under
+    content-addressed keys, skipping objects that already exist, then crawls rows,
+    validators and unchanged markers into the buffered writer. A 200 whose content
+    hash matches the previous crawl counts as unchanged; a page whose parse raised
+    (the exception is passed in place of the parse result) gets an ERROR row.
+    """
+    from ...storage.s3 import put_many
+    pages: List[Any] = []  # an outcome, or a page to write once uploads are done
+    uploads: List[Tuple[str, bytes, str]] = []
+    outcomes: List[str] = []
+    for ctx, parsed in items:
+        site, url, status, html = ctx["site"], ctx["url"], ctx["status"], ctx["html"]
+        if isinstance(parsed, BaseException):
+            logger.error("crawler Failed %s %s: parse failed: %s", site, url, parsed)
+            writer.add_crawl(_error_row(site, url, ctx["source"]))
+            pages.append(ERROR)
+            continue
+        text, content_hash = parsed if parsed is not None else ("", ctx["bodyhash"] or _sha256(html or ""))
+        ok = bool(status and 200 <= int(status) < 400)
+        if ok and ctx["prevhash"] == content_hash:
+            writer.add_validators(url, site, ctx["etag"], ctx["lastmodified"], content_hash)
+            writer.mark_unchanged(site, url)
+            pages.append(UNCHANGED)
+            continue
+        htmlkey = None
+        if ctx["store_html"] and html:
+            htmlkey = f"raw-html/{site}/{content_hash}.html"
+            uploads.append((htmlkey, html.encode("utf-8", errors="ignore"), "text/html; charset=utf-8"))
+        pages.append((ctx, text, content_hash, ok, htmlkey))
+    try:
+        uploaded = put_many(uploads, skip_existing=True) if uploads else {}
+    except Exception as e:
+        logger.error("crawler raw HTML upload of %d pages failed: %s", len(uploads), e)
+        uploaded = {key: "failed" for key, _, _ in uploads}
+    for page in pages:
+        if isinstance(page, str):
+            outcomes.append(page)
+            continue
+        ctx, text, content_hash, ok, htmlkey = page
+        site, url = ctx["site"], ctx["url"]
+        if htmlkey and uploaded.get(htmlkey) == "failed":
+            logger.error("crawler Failed %s %s: raw HTML upload failed", site, url)
+            ok, htmlkey = False, None
+        writer.add_crawl(dict(
+            site=site,
+            url=url,
+            httpstatus=int(ctx["status"] or 0),
+            contenthash=content_hash,
+            textexcerpt=(text or "")[:EXCERPT_CHARS],
+            textfullref=htmlkey or "",
+            lang=ctx["lang"] or "en",
+            source=ctx["source"],
+            status="OK" if ok else "ERROR",
+        ))
+        if ok:
+            writer.add_validators(url, site, ctx["etag"], ctx["lastmodified"], content_hash)
+        outcomes.append(OK if ok else ERROR)
+    return outcomes
+
+def _crawl_one(site: str, url: str, source: str, store_html: bool, writer: CrawlWriter,
+               validators: Dict[str, Dict[str, Optional[str]]], extractor: str = "readability") -> str:
+    """
+    Fetch, parse and persist one page inline (sites/crawls rows, optional raw HTML).
+    Re-crawls are conditional on the stored ETag/Last-Modified; a 304, or a 200 whose
+    content hash matches the previous crawl, only bumps freshness timestamps.
+    Failures still record an ERROR crawl row. Returns OK, ERROR or UNCHANGED.
+    """
+    fetched = _fetch_stage(site, url, source, store_html, writer, validators)
+    if isinstance(fetched, str):
+        return fetched
+    ctx, html = fetched
+    try:
+        parsed = _parser(extractor)(html) if html is not None else None
+        return _persist_stage([(ctx, parsed)], writer)[0]
+    except Exception as e:
+        logger.exception("crawler Failed %s %s: %s", site, url, e)
+        writer.add_crawl(_error_row(site, url, source))
+        return ERROR
+
+def _drop_fresh(jobs, min_age_hours: Optional[float]):
+    """Freshness policy: skip sites whose lastcrawledat is within min_age_hours."""
+    if not min_age_hours or min_age_hours <= 0:
+        return jobs
+    fresh = sites_crawled_within(sorted({site for site, _ in jobs}), min_age_hours * 3600.0)
+    if fresh:
+        logger.info("CRAWL skipping %d sites crawled within %.1fh", len(fresh), min_age_hours)
+    return [(site, url) for site, url in jobs if site not in fresh]
+
+def _run_jobs(jobs, source: str, store_html: bool, concurrency: int, per_host: int,
+              min_age_hours: Optional[float] = None, extractor: str = "readability",
+              parse_workers: Optional[int] = None, write_batch: int = 500) -> CrawlStats:
+    """
+    concurrency 1 crawls sequentially. Above 1, fetching and parsing are split:
+    fetch threads feed a process pool of parse_workers (default: all cores) and
+    rows are written in batches of write_batch; parse_workers=0 parses inline on
+    the fetch threads instead. Validators for all jobs are read up front in one
+    batched query; all DB writes go through one CrawlWriter (flushed every
+    write_batch rows or few seconds, and before returning).
+    """
+    jobs = _drop_fresh(jobs, min_age_hours)
+    validators = get_validators_many([url for _, url in jobs])
+    with CrawlWriter(max_rows=write_batch) as writer:
+        if concurrency > 1 and parse_workers != 0:
+            stats = crawl_pipelined(
+                jobs,
+                fetch=partial(_fetch_stage, source=source, store_html=store_html, writer=writer,
+                              validators=validators),
+                parse=_parser(extractor),
+                persist=partial(_persist_stage, writer=writer),
+                concurrency=concurrency,
+                per_host=per_host,
+                parse_workers=parse_workers,
+                batch_size=write_batch,
+            )
+        else:
+            handler = partial(_crawl_one, source=source, store_html=store_html, writer=writer,
+                              validators=validators, extractor=extractor)
+            if concurrency > 1:
+                stats = crawl_concurrently(jobs, handler, concurrency=concurrency, per_host=per_host)
+            else:
+                stats = crawl_sequentially(jobs, handler)
+    # pages whose rows never reached the DB count as failed, so queue workers retry them
+    for job in sorted(writer.dropped_jobs):
+        stats.mark_failed(job)
+    logger.info("ROBOTS cache: %s", robots_cache_stats())
+    logger.info("FETCH bytes: %s", fetch_stats())
+    return stats
+
+def crawl_sites(sites: List[str], source: str = "batch", store_html: bool = False,
+                concurrency: int = 1, per_host: int = 2,
+                min_age_hours: Optional[float] = None, extractor: str = "readability",
+                parse_workers: Optional[int] = None, write_batch: int = 500) -> CrawlStats:
     create_tables_if_missing()
+    jobs = [(site, f"https://{site}") for site in sites]
+    return _run_jobs(jobs, source, store_html, concurrency, per_host, min_age_hours, extractor,
+                     parse_workers, write_batch)
+
+def _url_jobs(df_urls: pd.DataFrame) -> List[Tuple[str, str]]:
+    jobs = []
     for _, row in df_urls.iterrows():
         site = str(row["website"]).strip().lower()
         url = str(row["url"]).strip()
         if not site or not url:
             continue
-        try:
-            upsert_site(site)
-            text, html, status, lang = fetch_text(url, return_html=True)
-            excerpt = (text or "")[:4000]
-            content_hash = _sha256(text or html or "")
-            htmlkey = None
-            if store_html and html:
-                htmlkey = f"raw-html/{site}/{content_hash}.html"
-                putbytes(htmlkey, (html or "").encode("utf-8", errors="ignore"), "text/html; charset=utf-8")
-            record_crawl(
-                site=site,
-                url=url,
-                httpstatus=int(status or 0),
-                contenthash=content_hash,
-                textexcerpt=excerpt,
-                textfullref=htmlkey or "",
-                lang=lang or "en",
-                source="urls_csv",
-                status="OK" if status and 200 <= int(status) < 400 else "ERROR",
-            )
-        except Exception as e:
-            logger.exception("crawler URL Failed %s %s: %s", site, url, e)
-            record_crawl(
-                site=site,
-                url=url,
-                httpstatus=0,
-                contenthash="",
-                textexcerpt="",
-                textfullref="",
-                lang="",
-                source="urls_csv",
-                status="ERROR",
-            )
\ No newline at end of file
+        jobs.append((site, url))
+    return jobs
+
+def crawl_site_urls(df_urls: pd.DataFrame, store_html: bool = False,
+                    concurrency: int = 1, per_host: int = 2,
+                    min_age_hours: Optional[float] = None,
+                    extractor: str = "readability",
+                    parse_workers: Optional[int] = None, write_batch: int = 500) -> CrawlStats:
+    """
+    Crawl per (website,url) row for multi-URL site aggregation.
+    """
+    create_tables_if_missing()
+    return _run_jobs(_url_jobs(df_urls), "urls_csv", store_html, concurrency, per_host, min_age_hours, extractor,
+                     parse_workers, write_batch)
+
+def sitemap_sample_urls(sites: List[str], per_site: int, concurrency: int = 16,
+                        seed: Optional[int] = None) -> pd.DataFrame:
+    """
+    website,url frame with up to per_site sitemap-sampled pages per site (stratified
+    by path prefix); sites without a readable sitemap fall back to their homepage.
+    """
+    pairs = sample_sites(sites, per_site, concurrency=concurrency, seed=seed)
+    sampled = {site for site, _ in pairs}
+    missing = [s.strip().lower() for s in sites if s.strip() and s.strip().lower() not in sampled]
+    if missing:
+        logger.info("SITEMAP no sample for %d sites, using homepages", len(missing))
+    pairs += [(site, f"https://{site}") for site in missing]
+    return pd.DataFrame(pairs, columns=["website", "url"])
+
+# ---------------- distributed mode (crawlqueue frontier) ----------------
+
+def enqueue_sites(sites: List[str], source: str = "manual") -> int:
+    create_tables_if_missing()
+    n = enqueue_crawl_jobs([(site, f"https://{site}") for site in sites], source=source)
+    logger.info("CRAWL queue: %d jobs enqueued, %s", n, crawl_queue_counts())
+    return n
+
+def enqueue_site_urls(df_urls: pd.DataFrame) -> int:
+    create_tables_if_missing()
+    n = enqueue_crawl_jobs(_url_jobs(df_urls), source="urls_csv")
+    logger.info("CRAWL queue: %d jobs enqueued, %s", n, crawl_queue_counts())
+    return n
+
+def run_crawl_worker(worker_id: Optional[str] = None, lease_batch: int = 500,
+                     lease_seconds: float = 1800.0, max_attempts: int = 3,
+                     poll_seconds: float = 0.0, store_html: bool = False,
+                     concurrency: int = 1, per_host: int = 2,
+                     min_age_hours: Optional[float] = None, extractor: str = "readability",
+                     parse_workers: Optional[int] = None, write_batch: int = 500) -> CrawlStats:
+    """
+    Lease batches from crawlqueue and crawl them with the regular engine until the
+    queue is drained (or, with poll_seconds > 0, keep polling for new work). Any
+    number of workers on any number of hosts can run against the same database.
+    Jobs that end in ERROR go back to the queue until max_attempts; a worker that
+    dies leaves its batch leased until lease_seconds pass, then another worker
+    picks it up. lease_seconds should comfortably exceed the time for one batch.
+    """
+    create_tables_if_missing()
+    owner = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    total = CrawlStats()
+    while True:
+        leased = lease_crawl_jobs(owner, lease_batch, lease_seconds, max_attempts)
+        if not leased:
+            if poll_seconds <= 0:
+                break
+            time.sleep(poll_seconds)
+            continue
+        logger.info("CRAWL worker %s leased %d jobs", owner, len(leased))
+        by_source: Dict[str, List[Tuple[int, str, str]]] = {}
+        for job_id, site, url, source in leased:
+            by_source.setdefault(source or "queue", []).append((job_id, site, url))
+        for source, rows in by_source.items():
+            ids = {(site, url): job_id for job_id, site, url in rows}
+            try:
+                stats = _run_jobs(list(ids), source, store_html, concurrency, per_host,
+                                  min_age_hours, extractor, parse_workers, write_batch)
+            except Exception as e:
+                logger.exception("CRAWL worker %s batch failed: %s", owner, e)
+                fail_crawl_jobs(list(ids.values()), owner, str(e), max_attempts)
+                continue
+            failed = {ids[j] for j in stats.failed if j in ids}
+            fail_crawl_jobs(sorted(failed), owner, "crawl error", max_attempts)
+            complete_crawl_jobs([i for i in ids.values() if i not in failed], owner)
+            total.pages += stats.pages
+            total.errors += stats.errors
+            total.unchanged += stats.unchanged
+    total.finished = time.monotonic()
+    logger.info("CRAWL worker %s done: %s, queue %s", owner, total.as_dict(), crawl_queue_counts())
+    return total
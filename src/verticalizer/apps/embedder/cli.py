@@ -10,4 +10,4 @@ def handle_embedder(args):
     from .service import embed_sites
     df = pd.read_csv(args.in_path)
     sites = [str(x).strip().lower() for x in df["website"].tolist() if str(x).strip()]
-    embed_sites(sites, model_name=args.model, store_to_s3=not args.no_s3)
+    embed_sites(sites, modelname=args.model, store_to_s3=not args.no_s3)
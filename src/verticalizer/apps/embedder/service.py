@@ -1,31 +1,94 @@
 # src/verticalizer/apps/embedder/service.py
 import hashlib
 import logging
-from typing import List
+from itertools import islice
+from typing import Callable, List, Optional, Tuple
 import numpy as np
-from ...storage.repositories import create_tables_if_missing, latest_text_for_site_batch, record_embedding
-from ...storage.s3 import put_bytes
+from ...storage.repositories import (
+    create_tables_if_missing, iter_latest_texts, latest_embedding_refs, record_embeddings, set_shard_vectorref,
+)
 from ...embeddings.gemini_client import GeminiEmbedder
+from ...embeddings.shards import SHARD_ROWS, ShardWriter, read_rows, s3_key
 
 logger = logging.getLogger(__name__)
 
+EMBED_CHUNK = 1000  # sites embedded and written per step
+
 def _sha256(s: str) -> str:
     return hashlib.sha256((s or "").encode("utf-8", errors="ignore")).hexdigest()
 
-def embed_sites(sites: List[str], modelname: str, store_to_s3: bool = True):
+def embed_sites(sites: List[str], modelname: str, store_to_s3: bool = True,
+                sink: Optional[Callable[[str, np.ndarray], None]] = None, chunk: int = EMBED_CHUNK,
+                rows_per_shard: int = SHARD_ROWS):
+    """
+    Embed the latest crawl text of each site, streaming texts from the DB and
+    embedding them EMBED_CHUNK sites at a time so memory stays flat. Vectors are
+    appended to packed shards (embeddings/shards.py); the `embeddings` rows with
+    their (shardref, shardrow) are recorded after every chunk, with an empty
+    vectorref until the shard is sealed and uploaded (a failed upload leaves the
+    shard local-only and the run continues).
+    `sink(site, vector)` is called for every embedded site (e.g. to fill a
+    preallocated matrix). Sites whose text could not be embedded are logged and
+    skipped (no row is recorded), so a later run retries them. Vectors of another
+    dim than the embedder's (GEMINI_EMB_DIM) raise ValueError.
+    """
     create_tables_if_missing()
-    texts = latest_text_for_site_batch(sites)
     embedder = GeminiEmbedder(model=modelname)
-    pairs = [(s, texts.get(s) or "") for s in sites]
-    vectors = embedder.embed_texts_dedup([t for _, t in pairs], show_progress=True)
-
-    for (site, text), vec in zip(pairs, vectors):
-        sh = _sha256(text)
-        key = f"embeddings/{site}/{modelname}/{sh}.npy"
-        arr = np.array(vec, dtype="float32")
-        vector_ref = None
-        if store_to_s3:
-            put_bytes(key, arr.tobytes(), "application/octet-stream")
-            vector_ref = key
-        record_embedding(site=site, modelname=modelname, dim=int(arr.shape),
-                         shatext=sh, vectorref=vector_ref or "", vectorlen=int(arr.shape))
\ No newline at end of file
+    dim = embedder.embeddim
+
+    def on_rows(ref: str, first: int, entries):
+        record_embeddings([
+            {"site": site, "modelname": modelname, "dim": dim, "shatext": sh,
+             "vectorref": "", "shardref": ref, "shardrow": row}
+            for row, (site, sh) in enumerate(entries, start=first)
+        ])
+
+    def on_sealed(ref: str, uploaded: bool):
+        if uploaded:
+            set_shard_vectorref(ref, s3_key(ref))
+
+    # shards are opened lazily, so a run that embeds nothing writes no shard
+    writer = ShardWriter(modelname, dim, rows_per_shard=rows_per_shard, upload=store_to_s3,
+                         on_rows=on_rows, on_sealed=on_sealed)
+    stream = iter_latest_texts(sites)
+    done = failed = 0
+    try:
+        while True:
+            batch = list(islice(stream, max(1, chunk)))
+            if not batch:
+                break
+            vectors = embedder.embed_texts_dedup([t or "" for _, t, _ in batch], show_progress=False,
+                                                 fill_failed=False)
+            for (site, text, _), vec in zip(batch, vectors):
+                if vec is None:
+                    failed += 1
+                    continue
+                writer.append(site, _sha256(text or ""), vec)
+                if sink is not None:
+                    sink(site, vec)
+            writer.checkpoint()
+            done += len(batch)
+            logger.info("EMBED %d sites embedded (%d API calls so far%s)", done, embedder.calls,
+                        f", {failed} failed" if failed else "")
+    finally:
+        writer.close()
+        if writer.upload_failed:
+            logger.error("EMBED %d shard(s) not uploaded, local-only: %s",
+                         len(writer.upload_failed), ", ".join(writer.upload_failed))
+
+def load_site_embeddings(sites: List[str], modelname: str, download: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Latest stored vector per site as (X, found): X is (len(sites), dim) float32 in
+    input order, found marks rows whose shard-backed embedding was actually read
+    (a missing or unreadable shard leaves a zero row, not found). Rows are read
+    per shard (memory-mapped, or ranged GETs unless `download`), not per site.
+    """
+    refs = latest_embedding_refs(sites, modelname)
+    dims = {dim for _, _, dim, _ in refs.values()}
+    if not dims:
+        return np.zeros((len(sites), 0), dtype=np.float32), np.zeros(len(sites), dtype=bool)
+    if len(dims) > 1:
+        raise ValueError(f"load_site_embeddings: mixed dims {sorted(dims)} for model {modelname}")
+    dim = dims.pop()
+    wanted = [(refs[s][0], refs[s][1]) if s in refs else None for s in sites]
+    return read_rows(wanted, dim, download=download)
@@ -1,5 +1,6 @@
 # src/verticalizer/apps/infer/service.py
 
+import logging
 import os
 from typing import List, Optional
 import pandas as pd
@@ -13,6 +14,16 @@ from ...pipeline.ensemble import load_many_models, load_many_calibrators, apply_
 from ...pipeline.common import prepareembeddingsfordf
 from ...pipeline.io import writejsonl
 
+logger = logging.getLogger(__name__)
+
+def _collapse_duplicates(probs_pages: np.ndarray) -> np.ndarray:
+    """Drop repeated page rows (exact or near-duplicate pages embedded to the same
+    vector) so templated copies do not outweigh the site's distinct pages."""
+    uniq = np.unique(probs_pages, axis=0)
+    if len(uniq) < len(probs_pages):
+        logger.info("INFER: collapsed %d duplicate page vectors", len(probs_pages) - len(uniq))
+    return uniq
+
 def _aggregate_group(probs_pages: np.ndarray, method: str = "mean") -> np.ndarray:
     if probs_pages.ndim != 2:
         raise ValueError("Expected 2D probs per group")
@@ -88,9 +99,9 @@ def infer_from_csv(
         groups = df.groupby(group_col, dropna=False, sort=False)
         for site, g in groups:
             g = g.reset_index(drop=True)
-            page_probs = predict_df(g)
+            page_probs = _collapse_duplicates(predict_df(g))
             site_prob = _aggregate_group(page_probs, method=page_agg)  # shape (1, L)
-            p = site_prob
+            p = site_prob[0]
             order = np.argsort(-p)[:max(1, topk)]
             cats = [{"id": classes[j], "label": id2label.get(classes[j], classes[j]), "prob": float(p[j])} for j in order]
             # Optionally add parents to top-k list without changing probs
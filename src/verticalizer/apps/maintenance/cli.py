@@ -0,0 +1,30 @@
+# src/verticalizer/apps/maintenance/cli.py
+
+def addmaintenanceclisubparsers(p):
+    sub = p.add_parser("maintenance", help="Database maintenance tasks")
+    tasks = sub.add_subparsers(dest="task", required=True)
+    c = tasks.add_parser("compact", help="Apply crawls retention and drop emptied monthly partitions")
+    c.add_argument("--keep", type=int, default=3,
+                   help="Crawls kept per site (newest first); rows referenced by embeddings are always kept")
+    c.add_argument("--older-than-months", dest="olderthan", type=int, default=1,
+                   help="Only touch partitions that ended at least this many months ago")
+    c.add_argument("--archive", action="store_true",
+                   help="Upload deleted rows to object storage (crawl-archive/) before deleting them")
+    c.add_argument("--keep-empty", dest="keepempty", action="store_true",
+                   help="Do not drop partitions left empty")
+    tasks.add_parser("partitions", help="Create crawls partitions for the coming months")
+    m = tasks.add_parser("migrate-embcache", help="Import legacy JSON embedding cache files into the SQLite store")
+    m.add_argument("--src", default=None, help="Directory of legacy {sha256}.json files (default: EMB_CACHE_DIR)")
+    m.add_argument("--remove", action="store_true", help="Delete JSON files once imported")
+
+def handlemaintenanceargs(args):
+    from ...storage.repositories import ensure_crawl_partitions
+    from .service import compact_crawls
+    if args.task == "compact":
+        print(compact_crawls(keep=args.keep, older_than_months=args.olderthan,
+                             archive=args.archive, drop_empty=not args.keepempty))
+    elif args.task == "partitions":
+        ensure_crawl_partitions()
+    elif args.task == "migrate-embcache":
+        from ...embeddings.cache import cache_stats, migrate_json_cache
+        print(migrate_json_cache(args.src, remove=args.remove), cache_stats())
@@ -0,0 +1,57 @@
+# src/verticalizer/apps/maintenance/service.py
+
+import gzip
+import logging
+from datetime import date
+from typing import Dict, List
+
+import orjson
+
+from ...storage.repositories import (
+    compact_crawl_partition,
+    create_tables_if_missing,
+    drop_crawl_partition_if_empty,
+    list_crawl_partitions,
+)
+
+logger = logging.getLogger(__name__)
+
+def _month_start(today: date, months_back: int) -> date:
+    m = today.year * 12 + today.month - 1 - months_back
+    return date(m // 12, m % 12 + 1, 1)
+
+def _archiver(partition: str):
+    """Uploads each deleted batch as gzipped JSONL under crawl-archive/{partition}/."""
+    from ...storage.s3 import put_bytes
+    part = [0]
+
+    def archive(rows: List[Dict]):
+        body = b"".join(orjson.dumps(r, default=str) + b"\n" for r in rows)
+        put_bytes(f"crawl-archive/{partition}/{part[0]:05d}.jsonl.gz", gzip.compress(body),
+                  "application/gzip")
+        part[0] += 1
+    return archive
+
+def compact_crawls(keep: int = 3, older_than_months: int = 1, archive: bool = False,
+                   drop_empty: bool = True) -> Dict[str, int]:
+    """
+    Retention for the monthly crawls partitions that ended at least
+    `older_than_months` months ago: delete rows that are neither among the `keep`
+    newest crawls of their site nor referenced by an embedding, optionally
+    archiving them to object storage first, then drop partitions left empty.
+    """
+    create_tables_if_missing()
+    cutoff = _month_start(date.today(), max(0, older_than_months))
+    out = {"partitions": 0, "deleted": 0, "dropped": 0}
+    for name, _lo, hi in list_crawl_partitions():
+        if hi > cutoff:
+            continue
+        deleted = compact_crawl_partition(name, keep=max(1, keep),
+                                          on_deleted=_archiver(name) if archive else None)
+        dropped = drop_empty and drop_crawl_partition_if_empty(name)
+        logger.info("COMPACT %s: deleted %d rows%s", name, deleted, ", dropped" if dropped else "")
+        out["partitions"] += 1
+        out["deleted"] += deleted
+        out["dropped"] += int(dropped)
+    logger.info("COMPACT done: %s", out)
+    return out
@@ -13,6 +13,7 @@ from .apps.embedder.cli import addembedderclisubparsers, handleembedderargs
 from .apps.trainer.cli import addtrainerclisubparsers, handletrainerargs
 from .apps.infer.cli import addinferclisubparsers, handleinferargs
 from .apps.evaluate.cli import addevaluateclisubparsers, handleevaluateargs
+from .apps.maintenance.cli import addmaintenanceclisubparsers, handlemaintenanceargs
 
 log = getlogger("verticalizer")
 
@@ -30,6 +31,7 @@ def app():
     addtrainerclisubparsers(sub)
     addinferclisubparsers(sub)
     addevaluateclisubparsers(sub)
+    addmaintenanceclisubparsers(sub)
 
     args = parser.parse_args()
     seedall(42)
@@ -43,6 +45,8 @@ def app():
         handleinferargs(args)
     elif args.cmd == "eval":
         handleevaluateargs(args)
+    elif args.cmd == "maintenance":
+        handlemaintenanceargs(args)
     else:
         parser.error("Unknown command")
 
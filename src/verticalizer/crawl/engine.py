@@ -0,0 +1,295 @@
+# src/verticalizer/crawl/engine.py
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from .scheduler import HostScheduler, Job
+
+logger = logging.getLogger(__name__)
+
+# handler outcomes
+OK = "ok"
+ERROR = "error"
+UNCHANGED = "unchanged"
+
+class CrawlStats:
+    def __init__(self):
+        self.pages = 0
+        self.errors = 0
+        self.unchanged = 0
+        self.started = time.monotonic()
+        self.finished: Optional[float] = None
+        self.failed: List[Job] = []  # jobs whose outcome was ERROR
+
+    def record(self, outcome: str, job: Optional[Job] = None):
+        self.pages += 1
+        if outcome == ERROR:
+            self.errors += 1
+            if job is not None:
+                self.failed.append(job)
+        elif outcome == UNCHANGED:
+            self.unchanged += 1
+
+    def mark_failed(self, job: Job):
+        """Turn an already recorded job into a failure (e.g. its row was dropped at write time)."""
+        if job not in self.failed:
+            self.failed.append(job)
+            self.errors += 1
+
+    def elapsed(self) -> float:
+        end = self.finished if self.finished is not None else time.monotonic()
+        return max(end - self.started, 1e-9)
+
+    def pages_per_sec(self) -> float:
+        return self.pages / self.elapsed()
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "pages": self.pages,
+            "errors": self.errors,
+            "unchanged": self.unchanged,
+            "elapsedSec": round(self.elapsed(), 3),
+            "pagesPerSec": round(self.pages_per_sec(), 3),
+        }
+
+async def _next_job(frontier: HostScheduler, changed: asyncio.Condition):
+    """Wait for a host whose politeness window is open; None once the frontier is drained."""
+    async with changed:
+        while True:
+            picked = frontier.take()
+            if picked is not None or frontier.remaining == 0:
+                return picked
+            # sleep until the next host's politeness window opens or a slot frees up
+            ready_at = frontier.next_ready_at()
+            timeout = None if ready_at is None else max(0.0, ready_at - time.monotonic())
+            try:
+                await asyncio.wait_for(changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+async def _release(frontier: HostScheduler, changed: asyncio.Condition, host: str):
+    async with changed:
+        frontier.release(host)
+        changed.notify_all()
+
+async def _report(stats: CrawlStats, total: int, every: float):
+    while True:
+        await asyncio.sleep(every)
+        logger.info("CRAWL progress: %d/%d pages, %.2f pages/sec", stats.pages, total, stats.pages_per_sec())
+
+async def _crawl_async(
+    jobs: List[Job],
+    handler: Callable[[str, str], str],
+    concurrency: int,
+    per_host: int,
+    stats: CrawlStats,
+    report_every: float,
+):
+    loop = asyncio.get_running_loop()
+    frontier = HostScheduler(jobs, per_host)
+    changed = asyncio.Condition()
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="crawl")
+
+    async def worker():
+        while True:
+            picked = await _next_job(frontier, changed)
+            if picked is None:
+                return
+            host, (site, url) = picked
+            try:
+                outcome = await loop.run_in_executor(executor, handler, site, url)
+            except Exception as e:  # handler is expected to swallow its own errors
+                logger.exception("crawl engine: handler failed for %s: %s", url, e)
+                outcome = ERROR
+            stats.record(outcome, (site, url))
+            await _release(frontier, changed, host)
+
+    rep = asyncio.create_task(_report(stats, len(jobs), report_every)) if report_every > 0 else None
+    try:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    finally:
+        if rep is not None:
+            rep.cancel()
+        executor.shutdown(wait=True)
+
+def crawl_concurrently(
+    jobs: Iterable[Job],
+    handler: Callable[[str, str], str],
+    concurrency: int = 64,
+    per_host: int = 2,
+    report_every: float = 10.0,
+) -> CrawlStats:
+    """
+    Run `handler(site, url)` for every job with at most `concurrency` jobs in flight
+    overall and at most `per_host` in flight per host, paced per host by the
+    HostScheduler politeness buckets. Blocking handlers run on a thread pool sized to
+    `concurrency`; the handler returns OK, ERROR or UNCHANGED.
+    """
+    jobs = list(jobs)
+    concurrency = max(1, min(int(concurrency), len(jobs) or 1))
+    stats = CrawlStats()
+    asyncio.run(_crawl_async(jobs, handler, concurrency, per_host, stats, report_every))
+    stats.finished = time.monotonic()
+    logger.info("CRAWL done: %d pages (%d errors, %d unchanged) in %.1fs, %.2f pages/sec",
+                stats.pages, stats.errors, stats.unchanged, stats.elapsed(), stats.pages_per_sec())
+    return stats
+
+# fetch stage result: a final outcome, or (context, html-or-None) to parse and persist
+Fetched = Union[str, Tuple[Any, Optional[str]]]
+
+def _parse_pool(workers: int) -> ProcessPoolExecutor:
+    # forkserver/spawn: forking while fetch threads hold locks is unsafe
+    methods = multiprocessing.get_all_start_methods()
+    ctx = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+    return ProcessPoolExecutor(max_workers=workers, mp_context=ctx)
+
+async def _pipeline_async(
+    jobs: List[Job],
+    fetch: Callable[[str, str], Fetched],
+    parse: Callable[[str], Any],
+    persist: Callable[[List[Tuple[Any, Any]]], List[str]],
+    concurrency: int,
+    per_host: int,
+    parse_workers: int,
+    queue_size: int,
+    batch_size: int,
+    stats: CrawlStats,
+    report_every: float,
+):
+    loop = asyncio.get_running_loop()
+    frontier = HostScheduler(jobs, per_host)
+    changed = asyncio.Condition()
+    io_pool = ThreadPoolExecutor(max_workers=concurrency + 1, thread_name_prefix="crawl")
+    cpu_pool = _parse_pool(parse_workers)
+    parsed_q: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    batch: List[Tuple[Job, Any, Any]] = []
+    flush_lock = asyncio.Lock()
+
+    async def fetcher():
+        while True:
+            picked = await _next_job(frontier, changed)
+            if picked is None:
+                return
+            host, (site, url) = picked
+            try:
+                item = await loop.run_in_executor(io_pool, fetch, site, url)
+            except Exception as e:
+                logger.exception("crawl engine: fetch failed for %s: %s", url, e)
+                item = ERROR
+            await _release(frontier, changed, host)
+            if isinstance(item, str):
+                stats.record(item, (site, url))
+            else:
+                await parsed_q.put(((site, url), item))  # blocks fetchers when parsing falls behind
+
+    async def flush():
+        async with flush_lock:
+            if not batch:
+                return
+            rows = batch[:]
+            batch.clear()
+            try:
+                outcomes = await loop.run_in_executor(io_pool, persist, [(c, p) for _, c, p in rows])
+            except Exception as e:
+                # retry page by page so one bad page does not cost the batch its rows
+                logger.exception("crawl engine: persist failed for %d pages, retrying one by one: %s",
+                                 len(rows), e)
+                outcomes = []
+                for job, c, p in rows:
+                    try:
+                        outcomes += await loop.run_in_executor(io_pool, persist, [(c, p)])
+                    except Exception as e1:
+                        logger.error("crawl engine: persist failed for %s: %s", job[1], e1)
+                        outcomes.append(ERROR)
+            for (job, _, _), o in zip(rows, outcomes, strict=True):
+                stats.record(o, job)
+
+    async def parser():
+        while True:
+            item = await parsed_q.get()
+            if item is None:
+                return
+            job, (ctx, html) = item
+            parsed = None
+            if html is not None:
+                try:
+                    parsed = await loop.run_in_executor(cpu_pool, parse, html)
+                except Exception as e:  # handed to persist so the page is recorded as failed
+                    logger.warning("crawl engine: parse failed for %s: %s", job[1], e)
+                    parsed = e
+            batch.append((job, ctx, parsed))
+            if len(batch) >= batch_size:
+                await flush()
+
+    rep = asyncio.create_task(_report(stats, len(jobs), report_every)) if report_every > 0 else None
+    parsers = [asyncio.create_task(parser()) for _ in range(parse_workers * 2)]
+    try:
+        await asyncio.gather(*(fetcher() for _ in range(concurrency)))
+        for _ in parsers:
+            await parsed_q.put(None)
+        await asyncio.gather(*parsers)
+        await flush()
+    finally:
+        if rep is not None:
+            rep.cancel()
+        io_pool.shutdown(wait=True)
+        cpu_pool.shutdown(wait=True)
+
+def crawl_pipelined(
+    jobs: Iterable[Job],
+    fetch: Callable[[str, str], Fetched],
+    parse: Callable[[str], Any],
+    persist: Callable[[List[Tuple[Any, Any]]], List[str]],
+    concurrency: int = 64,
+    per_host: int = 2,
+    parse_workers: Optional[int] = None,
+    queue_size: int = 256,
+    batch_size: int = 500,
+    report_every: float = 10.0,
+) -> CrawlStats:
+    """
+    Fetch and parse as separate stages. `fetch(site, url)` runs on up to
+    `concurrency` threads (politeness as in crawl_concurrently) and returns either a
+    final outcome or (context, html). HTML goes through a bounded queue to
+    `parse(html)` on a process pool of `parse_workers` (default: all cores); parsed
+    pages are handed to `persist(batch)` in batches of `batch_size`, which returns one
+    outcome per page; a page whose parse raised is passed with the exception in
+    place of the parse result. A batch whose persist raises is retried page by
+    page. `parse` must be picklable (a module-level function or partial).
+    """
+    jobs = list(jobs)
+    concurrency = max(1, min(int(concurrency), len(jobs) or 1))
+    parse_workers = max(1, int(parse_workers or os.cpu_count() or 1))
+    stats = CrawlStats()
+    asyncio.run(_pipeline_async(jobs, fetch, parse, persist, concurrency, per_host, parse_workers,
+                                max(1, queue_size), max(1, batch_size), stats, report_every))
+    stats.finished = time.monotonic()
+    logger.info("CRAWL done: %d pages (%d errors, %d unchanged) in %.1fs, %.2f pages/sec",
+                stats.pages, stats.errors, stats.unchanged, stats.elapsed(), stats.pages_per_sec())
+    return stats
+
+def crawl_sequentially(jobs: Iterable[Job], handler: Callable[[str, str], str]) -> CrawlStats:
+    """Single-threaded variant: always fetches from the next host that is ready."""
+    frontier = HostScheduler(jobs, per_host=1)
+    stats = CrawlStats()
+    while frontier.remaining:
+        picked = frontier.take()
+        if picked is None:
+            time.sleep(max(0.0, (frontier.next_ready_at() or 0.0) - time.monotonic()))
+            continue
+        host, (site, url) = picked
+        try:
+            outcome = handler(site, url)
+        except Exception as e:
+            logger.exception("crawl engine: handler failed for %s: %s", url, e)
+            outcome = ERROR
+        stats.record(outcome, (site, url))
+        frontier.release(host)
+    stats.finished = time.monotonic()
+    logger.info("CRAWL done: %d pages (%d errors, %d unchanged) in %.1fs, %.2f pages/sec",
+                stats.pages, stats.errors, stats.unchanged, stats.elapsed(), stats.pages_per_sec())
+    return stats
@@ -1,48 +1,174 @@
 # src/verticalizer/crawl/fetcher.py
+import codecs
 import logging
-import requests
-from .robots import robots_allowed, delay, DEFAULT_UA, TIMEOUT
-from .parse import extract_readable_text
+import os
+import re
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional
+from .robots import robots_allowed, DEFAULT_UA, TIMEOUT
+from .parse import MAX_CHARS, extract_readable_text
+from .session import http_get
 
 logger = logging.getLogger(__name__)
 
+HTTP_MAX_BYTES = int(os.environ.get("HTTP_MAX_BYTES", str(2 * 1024 * 1024)))  # per-page body cap
+_CHUNK = 16384
+_HTML_TYPES = ("text/html", "application/xhtml+xml")
+_META_CHARSET = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([a-zA-Z0-9_\-:.]+)""", re.I)
+_BOMS = ((codecs.BOM_UTF8, "utf-8"), (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16"))
+
+class _FetchCounters:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.c: Dict[str, int] = {"pages": 0, "bytesRead": 0, "bytesSaved": 0,
+                                  "truncated": 0, "skippedNonHtml": 0}
+
+    def add(self, **kw):
+        with self._lock:
+            for k, v in kw.items():
+                self.c[k] += v
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.c)
+
+_counters = _FetchCounters()
+
+def fetch_stats() -> Dict[str, int]:
+    """
+    Process-wide download counters. bytesRead counts decoded body bytes kept;
+    bytesSaved counts wire bytes (per Content-Length) never downloaded.
+    """
+    return _counters.snapshot()
+
+@dataclass
+class FetchResult:
+    text: str = ""
+    html: Optional[str] = None
+    status: int = 0
+    lang: Optional[str] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    is_html: bool = False  # 2xx HTML body was read
+
+    @property
+    def not_modified(self) -> bool:
+        return self.status == 304
+
 def normalize_url(website: str) -> str:
     website = (website or "").strip()
     if website.startswith("http://") or website.startswith("https://"):
         return website
     return f"https://{website}"
 
-def fetch_text(website: str, return_html: bool = False):
+def _content_length(resp) -> int:
+    try:
+        return max(0, int(resp.headers.get("Content-Length") or 0))
+    except ValueError:
+        return 0
+
+def _wire_bytes(resp) -> int:
+    """Bytes pulled off the connection so far, before content decoding (same unit as Content-Length)."""
+    try:
+        return int(resp.raw.tell())
+    except Exception:
+        return 0
+
+def _sniff_charset(ctype: str, head: bytes) -> str:
+    """BOM, then header charset, then <meta charset> in the first KB; utf-8 otherwise."""
+    candidates = [enc for bom, enc in _BOMS if head.startswith(bom)]
+    header = re.search(r"charset=[\"']?([\w\-:.]+)", ctype or "")
+    if header:
+        candidates.append(header.group(1))
+    meta = _META_CHARSET.search(head[:1024])
+    if meta:
+        candidates.append(meta.group(1).decode("ascii", errors="ignore"))
+    for enc in candidates:
+        try:
+            return codecs.lookup(enc.strip().strip("\"'")).name
+        except LookupError:
+            continue
+    return "utf-8"
+
+def _read_capped(resp, max_bytes: int) -> str:
+    """Stream the body up to max_bytes, then decode with a sniffed charset."""
+    buf = bytearray()
+    truncated = False
+    for chunk in resp.iter_content(chunk_size=_CHUNK):
+        if len(buf) + len(chunk) > max_bytes:
+            buf += chunk[: max_bytes - len(buf)]
+            truncated = True
+            break
+        buf += chunk
+    saved = max(0, _content_length(resp) - _wire_bytes(resp)) if truncated else 0
+    _counters.add(pages=1, bytesRead=len(buf), bytesSaved=saved, truncated=int(truncated))
+    if truncated:
+        logger.info("Truncated %s at %d bytes", resp.url, max_bytes)
+    enc = _sniff_charset(resp.headers.get("Content-Type") or "", bytes(buf[:1024]))
+    return bytes(buf).decode(enc, errors="replace")
+
+def fetch_page(website: str, return_html: bool = False,
+               etag: Optional[str] = None, last_modified: Optional[str] = None,
+               max_bytes: int = HTTP_MAX_BYTES, extractor: str = "readability",
+               max_chars: int = MAX_CHARS, parse: bool = True) -> FetchResult:
     """
-    Returns (text, html, status, lang) with robots.txt respect and defensive guards.
-    - text: readable extracted excerpt
-    - html: raw HTML if requested (else None)
-    - status: HTTP status or 0 on failure
-    - lang: best-effort language code (None if unknown)
+    Fetch one page with robots.txt respect and defensive guards.
+    When validators from a previous crawl are given, the request is conditional
+    (If-None-Match / If-Modified-Since) and a 304 comes back with no body or text.
+    The body is streamed: non-HTML responses are dropped before reading it, and
+    HTML is read up to max_bytes. `extractor` selects the text extractor
+    ("readability" or the single-pass "fast"), which keeps at most max_chars.
+    With parse=False the HTML is returned unparsed (text stays empty) so a separate
+    parse stage can run it; html is then always returned for 2xx HTML.
     """
     url = normalize_url(website)
     if not robots_allowed(url):
         logger.warning("ROBOTS disallow: %s", url)
-        return "", None, 403, None
+        return FetchResult(status=403)
 
     headers = {
         "User-Agent": DEFAULT_UA,
         "Accept": "text/html,application/xhtml+xml",
     }
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
     try:
-        resp = requests.get(url, timeout=TIMEOUT, headers=headers)
-        status = resp.status_code
-        ctype = (resp.headers.get("Content-Type") or "").lower()
-        if 200 <= status < 300 and ("text/html" in ctype or "application/xhtml+xml" in ctype):
-            delay()
-            html = resp.text or ""
-            text = extract_readable_text(html) or ""
-            # very coarse lang best-effort; could be improved with fasttext or CLD3 offline
-            lang = (resp.headers.get("Content-Language") or "").split(",").strip() or None
-            return text, (html if return_html else None), status, (lang or "en")
-        else:
+        with http_get(url, timeout=TIMEOUT, headers=headers, stream=True) as resp:
+            status = resp.status_code
+            new_etag, new_last_modified = resp.headers.get("ETag"), resp.headers.get("Last-Modified")
+            if status == 304:
+                return FetchResult(status=status, etag=new_etag, last_modified=new_last_modified)
+            ctype = (resp.headers.get("Content-Type") or "").lower()
+            is_html = any(t in ctype for t in _HTML_TYPES)
+            if 200 <= status < 300 and is_html:
+                html = _read_capped(resp, max_bytes)
+                text = ""
+                if parse:
+                    text = extract_readable_text(html, extractor=extractor, max_chars=max_chars) or ""
+                # very coarse lang best-effort; could be improved with fasttext or CLD3 offline
+                lang = (resp.headers.get("Content-Language") or "").split(",")[0].strip() or None
+                keep = return_html or not parse
+                return FetchResult(text, (html if keep else None), status, (lang or "en"),
+                                   etag=new_etag, last_modified=new_last_modified, is_html=True)
             logger.warning("Non-HTML or bad status for %s: %s %s", url, status, ctype)
-            return "", (resp.text if return_html else None), status, None
+            if is_html and return_html:
+                return FetchResult("", _read_capped(resp, max_bytes), status, None)
+            _counters.add(bytesSaved=_content_length(resp), skippedNonHtml=int(not is_html))
+            return FetchResult("", None, status, None)
     except Exception as e:
         logger.exception("fetch_text failed for %s: %s", url, e)
-        return "", None, 0, None
\ No newline at end of file
+        return FetchResult()
+
+def fetch_text(website: str, return_html: bool = False):
+    """
+    Returns (text, html, status, lang) with robots.txt respect and defensive guards.
+    - text: readable extracted excerpt
+    - html: raw HTML if requested (else None)
+    - status: HTTP status or 0 on failure
+    - lang: best-effort language code (None if unknown)
+    """
+    r = fetch_page(website, return_html=return_html)
+    return r.text, r.html, r.status, r.lang
@@ -1,10 +1,19 @@
 # src/verticalizer/crawl/parse.py
+import hashlib
+import re
+from typing import List, Optional, Tuple
 from bs4 import BeautifulSoup
+from lxml import etree
 from readability import Document
 
 MAX_CHARS = 200000  # bound for downstream embedding API
+EXTRACTORS = ("readability", "fast")
 
-def extract_readable_text(html: str) -> str:
+def extract_readable_text(html: str, extractor: str = "readability", max_chars: int = MAX_CHARS) -> str:
+    if extractor == "fast":
+        return extract_fast_text(html, max_chars=max_chars)
+    if extractor != "readability":
+        raise ValueError(f"Unknown extractor: {extractor}")
     html = html or ""
     try:
         doc = Document(html)
@@ -25,9 +34,9 @@ def extract_readable_text(html: str) -> str:
         texts.append(title)
 
     for m in soup.find_all("meta"):
-        name = (m.get("name") or m.get("property") or "").lower()
+        name = str(m.get("name") or m.get("property") or "").lower()
         if name in ("description", "og:description"):
-            content = (m.get("content") or "").strip()
+            content = str(m.get("content") or "").strip()
             if content:
                 texts.append(content)
 
@@ -41,6 +50,129 @@ def extract_readable_text(html: str) -> str:
         texts.append(body)
 
     text = "\n".join(t for t in texts if t)
-    if len(text) > MAX_CHARS:
-        text = text[:MAX_CHARS]
-    return text
\ No newline at end of file
+    if len(text) > max_chars:
+        text = text[:max_chars]
+    return text
+
+# ---------------- fast single-pass extractor ----------------
+
+_SKIP_TAGS = {
+    "script", "style", "noscript", "template", "svg", "iframe", "object", "canvas",
+    "nav", "header", "footer", "aside", "form", "button", "select", "textarea",
+}
+_VOID_TAGS = {"meta", "link", "img", "br", "hr", "input", "source", "wbr", "area", "base", "col", "embed"}
+_HEADINGS = {"h1", "h2", "h3"}
+_BOILERPLATE = re.compile(
+    r"(^|[\s_-])(nav|navbar|menu|footer|sidebar|breadcrumbs?|cookie|consent|banner|share|social|"
+    r"comments?|related|subscribe|newsletter|popup|modal|advert|ads?)($|[\s_-])",
+    re.I,
+)
+_FEED_CHUNK = 65536
+_MAX_HEADINGS = 5
+
+class _FastCollector:
+    """lxml parser target: collects title, meta descriptions, headings and body text
+    in document order, skipping script/style and boilerplate containers."""
+
+    def __init__(self, budget: int):
+        self.budget = budget
+        self.title: List[str] = []
+        self.metas: List[str] = []
+        self.headings: List[str] = []
+        self.body: List[str] = []
+        self.body_len = 0
+        self.skip_depth = 0
+        self.in_title = False
+        self.heading: Optional[List[str]] = None
+
+    @property
+    def full(self) -> bool:
+        return self.body_len >= self.budget
+
+    def start(self, tag, attrib):
+        tag = tag.lower() if isinstance(tag, str) else ""
+        if self.skip_depth:
+            if tag not in _VOID_TAGS:
+                self.skip_depth += 1
+            return
+        if tag == "meta":
+            name = (attrib.get("name") or attrib.get("property") or "").lower()
+            if name in ("description", "og:description"):
+                content = (attrib.get("content") or "").strip()
+                if content:
+                    self.metas.append(content)
+            return
+        if tag in _VOID_TAGS:
+            return
+        marker = f"{attrib.get('class', '')} {attrib.get('id', '')} {attrib.get('role', '')}"
+        if tag in _SKIP_TAGS or (marker.strip() and _BOILERPLATE.search(marker)):
+            self.skip_depth = 1
+        elif tag == "title":
+            self.in_title = True
+        elif tag in _HEADINGS and len(self.headings) < _MAX_HEADINGS:
+            self.heading = []
+
+    def end(self, tag):
+        tag = tag.lower() if isinstance(tag, str) else ""
+        if self.skip_depth:
+            if tag not in _VOID_TAGS:
+                self.skip_depth -= 1
+            return
+        if tag == "title":
+            self.in_title = False
+        elif tag in _HEADINGS and self.heading is not None:
+            h = " ".join(" ".join(self.heading).split())
+            if h:
+                self.headings.append(h)
+            self.heading = None
+
+    def data(self, data):
+        if self.skip_depth:
+            return
+        if self.in_title:
+            self.title.append(data)
+            return
+        if self.heading is not None:
+            self.heading.append(data)
+        if self.body_len < self.budget and data.strip():
+            self.body.append(data)
+            self.body_len += len(data)
+
+    def comment(self, text):
+        pass
+
+    def close(self):
+        return self
+
+def extract_fast_text(html: str, max_chars: int = MAX_CHARS) -> str:
+    """
+    Single lxml pass over the HTML; stops feeding the parser once the body budget
+    is filled. Output layout matches extract_readable_text: title, meta
+    descriptions, headings, then body text, newline-separated.
+    """
+    html = html or ""
+    col = _FastCollector(max_chars)
+    parser = etree.HTMLParser(target=col, recover=True, no_network=True)
+    try:
+        for i in range(0, len(html), _FEED_CHUNK):
+            parser.feed(html[i:i + _FEED_CHUNK])
+            if col.full:
+                break
+        parser.close()
+    except (etree.LxmlError, ValueError):
+        pass
+    texts = [" ".join(" ".join(col.title).split())] + col.metas + col.headings
+    texts.append(" ".join(" ".join(col.body).split()))
+    text = "\n".join(t for t in texts if t)
+    if len(text) > max_chars:
+        text = text[:max_chars]
+    return text
+
+def parse_html(html: str, extractor: str = "readability", max_chars: int = MAX_CHARS) -> Tuple[str, str]:
+    """
+    Parse-stage entry point (safe to run in a process pool): returns the extracted
+    text and the sha256 content hash of the text (of the raw HTML if no text).
+    """
+    text = extract_readable_text(html, extractor=extractor, max_chars=max_chars) or ""
+    h = hashlib.sha256((text or html or "").encode("utf-8", errors="ignore")).hexdigest()
+    return text, h
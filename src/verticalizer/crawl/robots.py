@@ -1,26 +1,192 @@
 # src/verticalizer/crawl/robots.py
+import hashlib
+import logging
+import threading
 import time
+from typing import Dict, List, Optional, Tuple
 from urllib.parse import urljoin, urlparse
 import urllib.robotparser as robotparser
-import requests
+import orjson
 import os
 
+from .session import http_get
+
+logger = logging.getLogger(__name__)
+
 DEFAULT_UA = os.environ.get("HTTP_USER_AGENT", "IABVerticalizerBot/1.0")
 TIMEOUT = int(os.environ.get("HTTP_TIMEOUT", "20"))
+ROBOTS_CACHE_TTL = int(os.environ.get("ROBOTS_CACHE_TTL", "86400"))  # seconds
+ROBOTS_NEGATIVE_TTL = int(os.environ.get("ROBOTS_NEGATIVE_TTL", "3600"))  # 5xx/timeouts
+ROBOTS_CACHE_DIR = os.environ.get("ROBOTS_CACHE_DIR", "")  # empty keeps the cache in memory only
 
-def robots_allowed(url: str, user_agent: str = DEFAULT_UA) -> bool:
+def _base_of(url: str) -> str:
     url = url if url.startswith("http") else f"https://{url}"
     parsed = urlparse(url)
-    base = f"{parsed.scheme}://{parsed.netloc}"
-    rp = robotparser.RobotFileParser()
+    return f"{parsed.scheme}://{parsed.netloc}".lower()
+
+class RobotsCache:
+    """
+    robots.txt parsers keyed by scheme+host with a TTL.
+    - 2xx: parsed rules, cached for `ttl`.
+    - 4xx: no robots.txt, everything allowed, cached for `ttl`.
+    - 5xx/timeouts/errors: everything allowed, cached for `negative_ttl` so the
+      host is retried sooner.
+    With `cache_dir` set, entries are also persisted as one JSON file per host so
+    restarts and parallel workers sharing the directory do not refetch.
+    """
+
+    def __init__(self, ttl: int = ROBOTS_CACHE_TTL, negative_ttl: int = ROBOTS_NEGATIVE_TTL,
+                 cache_dir: str = ROBOTS_CACHE_DIR):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.cache_dir = cache_dir or None
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        # base -> (expires_at, parser); parser None means "allow everything"
+        self._entries: Dict[str, Tuple[float, Optional[robotparser.RobotFileParser]]] = {}
+        self._lock = threading.Lock()
+        self._base_locks: Dict[str, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.negative = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "diskHits": self.disk_hits,
+                    "negative": self.negative, "entries": len(self._entries)}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _lookup(self, base: str):
+        entry = self._entries.get(base)
+        if entry is not None and entry[0] > time.time():
+            return entry
+        return None
+
+    def peek(self, url: str) -> Optional[robotparser.RobotFileParser]:
+        """Cached parser for the host without fetching; None when unknown or allow-all."""
+        with self._lock:
+            entry = self._lookup(_base_of(url))
+        return entry[1] if entry is not None else None
+
+    def get(self, url: str, user_agent: str = DEFAULT_UA) -> Optional[robotparser.RobotFileParser]:
+        base = _base_of(url)
+        with self._lock:
+            entry = self._lookup(base)
+            if entry is not None:
+                self.hits += 1
+                return entry[1]
+            base_lock = self._base_locks.setdefault(base, threading.Lock())
+        # one fetch per host even when several workers miss at the same time
+        with base_lock:
+            with self._lock:
+                entry = self._lookup(base)
+                if entry is not None:
+                    self.hits += 1
+                    return entry[1]
+                self.misses += 1
+            entry = self._load_disk(base)
+            if entry is None:
+                entry = self._fetch(base, user_agent)
+                self._save_disk(base, *entry)
+            else:
+                with self._lock:
+                    self.disk_hits += 1
+            expires, body = entry
+            parser = None
+            if body is not None:
+                parser = robotparser.RobotFileParser()
+                parser.parse(body.splitlines())
+            with self._lock:
+                self._entries[base] = (expires, parser)
+            return parser
+
+    def _fetch(self, base: str, user_agent: str) -> Tuple[float, Optional[str]]:
+        """Returns (expires_at, robots body or None for allow-all)."""
+        try:
+            resp = http_get(urljoin(base, "/robots.txt"), timeout=TIMEOUT,
+                            headers={"User-Agent": user_agent})
+            if resp.status_code >= 500:
+                with self._lock:
+                    self.negative += 1
+                return time.time() + self.negative_ttl, None
+            if resp.status_code >= 400:
+                return time.time() + self.ttl, None
+            return time.time() + self.ttl, resp.text
+        except Exception as e:
+            logger.debug("robots.txt fetch failed for %s: %s", base, e)
+            with self._lock:
+                self.negative += 1
+            return time.time() + self.negative_ttl, None
+
+    def _path(self, base: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha1(base.encode("utf-8")).hexdigest() + ".json")
+
+    def _load_disk(self, base: str) -> Optional[Tuple[float, Optional[str]]]:
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._path(base), "rb") as f:
+                rec = orjson.loads(f.read())
+        except (OSError, ValueError):
+            return None
+        if rec.get("base") != base or float(rec.get("expires", 0)) <= time.time():
+            return None
+        return float(rec["expires"]), rec.get("body")
+
+    def _save_disk(self, base: str, expires: float, body: Optional[str]):
+        if not self.cache_dir:
+            return
+        path = self._path(base)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(orjson.dumps({"base": base, "expires": expires, "body": body}))
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.debug("robots cache write failed for %s: %s", base, e)
+
+_cache = RobotsCache()
+
+def robots_cache_stats() -> Dict[str, int]:
+    return _cache.stats()
+
+def robots_allowed(url: str, user_agent: str = DEFAULT_UA) -> bool:
+    url = url if url.startswith("http") else f"https://{url}"
+    rp = _cache.get(url, user_agent)
+    if rp is None:
+        return True
     try:
-        resp = requests.get(urljoin(base, "/robots.txt"), timeout=TIMEOUT, headers={"User-Agent": user_agent})
-        if resp.status_code >= 400:
-            return True
-        rp.parse(resp.text.splitlines())
         return rp.can_fetch(user_agent, url)
     except Exception:
         return True
 
-def delay():
-    time.sleep(0.7)
\ No newline at end of file
+def crawl_delay(url: str, user_agent: str = DEFAULT_UA) -> Optional[float]:
+    """Crawl-delay (or 1/Request-rate) for the host if its robots.txt is already cached."""
+    rp = _cache.peek(url)
+    if rp is None:
+        return None
+    try:
+        d = rp.crawl_delay(user_agent)
+        if d is not None:
+            return float(d)
+        rate = rp.request_rate(user_agent)
+        if rate is not None and rate.requests:
+            return float(rate.seconds) / float(rate.requests)
+    except Exception:
+        return None
+    return None
+
+def robots_sitemaps(url: str, user_agent: str = DEFAULT_UA) -> List[str]:
+    """`Sitemap:` URLs declared in the host's robots.txt (fetched through the cache)."""
+    url = url if url.startswith("http") else f"https://{url}"
+    rp = _cache.get(url, user_agent)
+    if rp is None:
+        return []
+    try:
+        return list(rp.site_maps() or [])
+    except Exception:
+        return []
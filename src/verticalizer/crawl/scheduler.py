@@ -0,0 +1,119 @@
+# src/verticalizer/crawl/scheduler.py
+import heapq
+import itertools
+import os
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from .robots import crawl_delay
+
+CRAWL_DEFAULT_DELAY = float(os.environ.get("CRAWL_DEFAULT_DELAY", "0.7"))  # seconds between fetches per host
+CRAWL_MAX_DELAY = float(os.environ.get("CRAWL_MAX_DELAY", "30"))  # cap on robots.txt Crawl-delay
+
+Job = Tuple[str, str]  # (site, url)
+
+def host_of(url: str) -> str:
+    url = (url or "").strip()
+    url = url if url.startswith("http://") or url.startswith("https://") else f"https://{url}"
+    return urlparse(url).netloc.lower()
+
+def polite_delay(url: str) -> float:
+    """Per-host interval: robots.txt Crawl-delay when cached, else CRAWL_DEFAULT_DELAY."""
+    d = crawl_delay(url)
+    if d is None:
+        return CRAWL_DEFAULT_DELAY
+    return max(0.0, min(float(d), CRAWL_MAX_DELAY))
+
+class TokenBucket:
+    """One token every `interval` seconds, holding at most `capacity` tokens."""
+
+    def __init__(self, interval: float, capacity: float = 1.0, now: Optional[float] = None):
+        self.interval = max(0.0, interval)
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic() if now is None else now
+
+    def _refill(self, now: float):
+        if self.interval <= 0:
+            self.tokens = self.capacity
+        elif now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) / self.interval)
+        self.updated = max(self.updated, now)
+
+    def ready_at(self, now: float) -> float:
+        self._refill(now)
+        if self.tokens >= 1.0:
+            return now
+        return now + (1.0 - self.tokens) * self.interval
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1.0
+
+class HostScheduler:
+    """
+    Crawl frontier ordered by host. Each host has a FIFO of jobs, a token bucket
+    paced by its politeness delay, and at most `per_host` jobs in flight. `take`
+    always returns a job from the host that became ready earliest, so throughput
+    grows with the number of distinct hosts rather than the number of URLs.
+    Not thread-safe; callers serialize access (event loop or a single thread).
+    """
+
+    def __init__(self, jobs: Iterable[Job], per_host: int = 1,
+                 delay_for: Callable[[str], float] = polite_delay):
+        self.per_host = max(1, per_host)
+        self.delay_for = delay_for
+        self.queues: Dict[str, Deque[Job]] = {}
+        for site, url in jobs:
+            self.queues.setdefault(host_of(url), deque()).append((site, url))
+        self.inflight: Dict[str, int] = {}
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.remaining = sum(len(q) for q in self.queues.values())
+        self._seq = itertools.count()
+        self._heap: List[Tuple[float, int, str]] = []
+        self._queued = set()
+        now = time.monotonic()
+        for host in self.queues:
+            self._push(host, now)
+
+    def _bucket(self, host: str, now: float) -> TokenBucket:
+        b = self.buckets.get(host)
+        if b is None:
+            _, url = self.queues[host][0] if self.queues[host] else ("", host)
+            b = self.buckets[host] = TokenBucket(self.delay_for(url), now=now)
+        return b
+
+    def _push(self, host: str, now: float):
+        if host in self._queued or not self.queues.get(host):
+            return
+        if self.inflight.get(host, 0) >= self.per_host:
+            return
+        heapq.heappush(self._heap, (self._bucket(host, now).ready_at(now), next(self._seq), host))
+        self._queued.add(host)
+
+    def next_ready_at(self) -> Optional[float]:
+        return self._heap[0][0] if self._heap else None
+
+    def take(self, now: Optional[float] = None) -> Optional[Tuple[str, Job]]:
+        now = time.monotonic() if now is None else now
+        if not self._heap or self._heap[0][0] > now:
+            return None
+        _, _, host = heapq.heappop(self._heap)
+        self._queued.discard(host)
+        self._bucket(host, now).take(now)
+        job = self.queues[host].popleft()
+        self.remaining -= 1
+        self.inflight[host] = self.inflight.get(host, 0) + 1
+        self._push(host, now)
+        return host, job
+
+    def release(self, host: str, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        self.inflight[host] -= 1
+        # robots.txt is cached by now, so pick up its Crawl-delay for the next fetch
+        b = self.buckets.get(host)
+        if b is not None and self.queues.get(host):
+            b.interval = self.delay_for(self.queues[host][0][1])
+        self._push(host, now)
@@ -0,0 +1,172 @@
+# src/verticalizer/crawl/session.py
+import ipaddress
+import logging
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from urllib3.util.connection import allowed_gai_family
+
+logger = logging.getLogger(__name__)
+
+HTTP_POOL_HOSTS = int(os.environ.get("HTTP_POOL_HOSTS", "1024"))  # per-host pools kept alive
+HTTP_POOL_PER_HOST = int(os.environ.get("HTTP_POOL_PER_HOST", "4"))  # keep-alive conns per host
+HTTP_DNS_CACHE_TTL = int(os.environ.get("HTTP_DNS_CACHE_TTL", "300"))  # seconds; 0 disables
+HTTP_DNS_CACHE_SIZE = int(os.environ.get("HTTP_DNS_CACHE_SIZE", "10000"))  # hosts kept
+
+def _accept_encoding() -> str:
+    # urllib3 only decodes br when a brotli package is importable
+    for mod in ("brotli", "brotlicffi"):
+        try:
+            __import__(mod)
+            return "gzip, deflate, br"
+        except ImportError:
+            continue
+    return "gzip, deflate"
+
+ACCEPT_ENCODING = _accept_encoding()
+
+class _DnsCache:
+    """
+    TTL + LRU cache of host -> addresses for the crawler's own connections
+    (successful lookups only). Bounded to `max_entries` hosts; expired entries are
+    re-resolved on use.
+    """
+
+    def __init__(self, ttl: int, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[Tuple[str, int, int], Tuple[float, List[str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def resolve(self, host: str, port: int) -> Optional[List[str]]:
+        """IP addresses for host, in resolver order; None if the lookup fails."""
+        family = allowed_gai_family()
+        key = (host, port, family)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        try:
+            infos = socket.getaddrinfo(host, port, family, socket.SOCK_STREAM)
+        except OSError:
+            return None
+        addrs = list(dict.fromkeys(info[4][0] for info in infos))
+        if not addrs:
+            return None
+        with self._lock:
+            self._entries[key] = (now + self.ttl, addrs)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return addrs
+
+    def forget(self, host: str, port: int):
+        with self._lock:
+            self._entries.pop((host, port, allowed_gai_family()), None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries),
+                    "evictions": self.evictions}
+
+_lock = threading.Lock()
+_session = None
+_dns = _DnsCache(HTTP_DNS_CACHE_TTL, HTTP_DNS_CACHE_SIZE) if HTTP_DNS_CACHE_TTL > 0 else None
+
+def _is_ip(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host.strip("[]"))
+        return True
+    except ValueError:
+        return False
+
+class _CachedDnsMixin:
+    """
+    Connects through _dns instead of resolving on every new connection. The
+    resolved addresses are tried in order by pointing _dns_host at each IP;
+    Host headers, SNI and certificate checks still use the hostname.
+    """
+
+    def _new_conn(self):
+        host = self._dns_host
+        addrs = _dns.resolve(host, self.port) if _dns is not None and host and not _is_ip(host) else None
+        if not addrs:
+            return super()._new_conn()
+        err = None
+        try:
+            for ip in addrs:
+                self._dns_host = ip
+                try:
+                    return super()._new_conn()
+                except (NewConnectionError, ConnectTimeoutError) as e:
+                    err = e
+            _dns.forget(host, self.port)
+            raise err
+        finally:
+            self._dns_host = host
+
+class _CachedDnsHTTPConnection(_CachedDnsMixin, HTTPConnection):
+    pass
+
+class _CachedDnsHTTPSConnection(_CachedDnsMixin, HTTPSConnection):
+    pass
+
+class _CachedDnsHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _CachedDnsHTTPConnection
+
+class _CachedDnsHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _CachedDnsHTTPSConnection
+
+class _CrawlAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools resolve hosts through the crawler DNS cache."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _CachedDnsHTTPConnectionPool,
+                                                   "https": _CachedDnsHTTPSConnectionPool}
+
+def get_session() -> requests.Session:
+    """
+    Shared keep-alive session used by robots.txt and page fetches.
+    urllib3 keeps one connection pool per host (up to HTTP_POOL_HOSTS pools, each
+    holding HTTP_POOL_PER_HOST idle connections); pools are thread-safe, so the
+    session is shared across crawler threads. New connections resolve hosts
+    through an in-process DNS cache (HTTP_DNS_CACHE_TTL, HTTP_DNS_CACHE_SIZE)
+    that only this session uses.
+    """
+    global _session
+    if _session is not None:
+        return _session
+    with _lock:
+        if _session is None:
+            s = requests.Session()
+            adapter = _CrawlAdapter(pool_connections=HTTP_POOL_HOSTS, pool_maxsize=HTTP_POOL_PER_HOST,
+                                   pool_block=False, max_retries=0)
+            s.mount("http://", adapter)
+            s.mount("https://", adapter)
+            s.headers["Accept-Encoding"] = ACCEPT_ENCODING
+            _session = s
+    return _session
+
+def http_get(url: str, **kwargs) -> requests.Response:
+    return get_session().get(url, **kwargs)
+
+def dns_cache_stats() -> Dict[str, int]:
+    return _dns.stats() if _dns is not None else {}
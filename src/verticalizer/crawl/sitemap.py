@@ -0,0 +1,159 @@
+# src/verticalizer/crawl/sitemap.py
+import gzip
+import io
+import logging
+import os
+import random
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+from lxml import etree
+
+from .robots import DEFAULT_UA, TIMEOUT, robots_allowed, robots_sitemaps
+from .scheduler import host_of
+from .session import http_get
+
+logger = logging.getLogger(__name__)
+
+SITEMAP_MAX_FILES = int(os.environ.get("SITEMAP_MAX_FILES", "50"))  # sitemap documents read per site
+SITEMAP_MAX_STRATA = int(os.environ.get("SITEMAP_MAX_STRATA", "64"))  # distinct path prefixes tracked per site
+_GZIP_MAGIC = b"\x1f\x8b"
+
+def _local(tag) -> str:
+    return tag.rsplit("}", 1)[-1] if isinstance(tag, str) else ""
+
+def _open_stream(resp):
+    """Raw response body as a file object, transparently gunzipping .xml.gz payloads."""
+    resp.raw.decode_content = True  # Content-Encoding: gzip
+    resp.raw.auto_close = False  # urllib3 closes at EOF, before the parser's final read
+    body = io.BufferedReader(resp.raw, buffer_size=65536)
+    if body.peek(2)[:2] == _GZIP_MAGIC:  # gzip file served as-is (sitemap.xml.gz)
+        return gzip.GzipFile(fileobj=body)
+    return body
+
+def iter_sitemap(url: str) -> Iterator[Tuple[str, str]]:
+    """
+    Stream one sitemap document and yield ("url", loc) for <urlset> entries or
+    ("sitemap", loc) for <sitemapindex> children. Parsed with iterparse and each
+    entry is freed once read, so memory stays flat for multi-million-entry files.
+    """
+    with http_get(url, timeout=TIMEOUT, headers={"User-Agent": DEFAULT_UA}, stream=True) as resp:
+        if resp.status_code != 200:
+            logger.info("SITEMAP %s: HTTP %s", url, resp.status_code)
+            return
+        events = etree.iterparse(_open_stream(resp), events=("end",), recover=True,
+                                 resolve_entities=False, no_network=True, huge_tree=True)
+        try:
+            for _, elem in events:
+                kind = _local(elem.tag)
+                if kind in ("url", "sitemap"):
+                    loc = next((c.text for c in elem if _local(c.tag) == "loc" and c.text), None)
+                    if loc:
+                        yield kind, loc.strip()
+                    elem.clear()
+                    parent = elem.getparent()
+                    while parent is not None and elem.getprevious() is not None:
+                        del parent[0]
+        except (etree.XMLSyntaxError, OSError, EOFError) as e:
+            logger.info("SITEMAP %s: stopped reading: %s", url, e)
+
+def discover_sitemaps(site: str) -> List[str]:
+    """robots.txt `Sitemap:` lines, falling back to /sitemap.xml."""
+    found = robots_sitemaps(f"https://{site}")
+    return found or [f"https://{site}/sitemap.xml"]
+
+def _same_site(url: str, site: str) -> bool:
+    host = host_of(url)
+    return host == site or host.endswith("." + site)
+
+def _stratum(url: str) -> str:
+    seg = urlparse(url).path.strip("/").split("/", 1)[0]
+    return seg.lower()
+
+class StratifiedReservoir:
+    """
+    Uniform sample of up to `n` URLs per path prefix (first path segment) over a
+    stream of unknown length (Algorithm R per stratum). Memory is bounded by
+    n * max_strata; prefixes beyond max_strata share one overflow stratum.
+    """
+
+    _OVERFLOW = "\x00other"
+
+    def __init__(self, n: int, max_strata: int = SITEMAP_MAX_STRATA, seed: Optional[int] = None):
+        self.n = max(1, n)
+        self.max_strata = max(1, max_strata)
+        self.rng = random.Random(seed)
+        self.seen: Dict[str, int] = {}
+        self.samples: Dict[str, List[str]] = {}
+
+    def add(self, url: str):
+        key = _stratum(url)
+        if key not in self.seen and len(self.seen) >= self.max_strata:
+            key = self._OVERFLOW
+        k = self.seen.get(key, 0) + 1
+        self.seen[key] = k
+        bucket = self.samples.setdefault(key, [])
+        if len(bucket) < self.n:
+            bucket.append(url)
+        else:
+            j = self.rng.randrange(k)
+            if j < self.n:
+                bucket[j] = url
+
+    def pick(self, n: Optional[int] = None) -> List[str]:
+        """Round-robin across strata, largest first, so the n URLs span as many path prefixes as possible."""
+        n = self.n if n is None else n
+        queues = [deque(self.rng.sample(b, len(b)))
+                  for _, b in sorted(self.samples.items(), key=lambda kv: -self.seen[kv[0]])]
+        out: List[str] = []
+        while len(out) < n and any(queues):
+            for q in queues:
+                if q and len(out) < n:
+                    out.append(q.popleft())
+        return out
+
+def sample_site_urls(site: str, n: int, seed: Optional[int] = None,
+                     max_files: int = SITEMAP_MAX_FILES) -> List[str]:
+    """
+    Up to n page URLs for `site` drawn from its sitemaps, stratified by path prefix.
+    Sitemap indexes are followed breadth-first up to max_files documents. Returns []
+    when the site has no readable sitemap.
+    """
+    site = site.strip().lower()
+    pending = deque(discover_sitemaps(site))
+    visited = set()
+    reservoir = StratifiedReservoir(n, seed=seed)
+    total = 0
+    while pending and len(visited) < max_files:
+        sm = pending.popleft()
+        if sm in visited:
+            continue
+        visited.add(sm)
+        if not robots_allowed(sm):
+            continue
+        try:
+            for kind, loc in iter_sitemap(sm):
+                if kind == "sitemap":
+                    if loc not in visited:
+                        pending.append(loc)
+                elif _same_site(loc, site):
+                    reservoir.add(loc)
+                    total += 1
+        except Exception as e:
+            logger.info("SITEMAP %s: fetch failed: %s", sm, e)
+    picked = reservoir.pick(n)
+    logger.info("SITEMAP %s: %d URLs in %d sitemaps, %d prefixes, sampled %d",
+                site, total, len(visited), len(reservoir.seen), len(picked))
+    return picked
+
+def sample_sites(sites: List[str], n: int, concurrency: int = 16,
+                 seed: Optional[int] = None) -> List[Tuple[str, str]]:
+    """sample_site_urls for many sites on a thread pool; returns (site, url) pairs."""
+    sites = [s.strip().lower() for s in sites if s and s.strip()]
+    if not sites:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(sites))),
+                            thread_name_prefix="sitemap") as pool:
+        results = list(pool.map(lambda s: sample_site_urls(s, n, seed=seed), sites))
+    return [(site, url) for site, urls in zip(sites, results) for url in urls]
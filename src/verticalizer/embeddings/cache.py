@@ -1,32 +1,280 @@
 # src/verticalizer/embeddings/cache.py
+"""
+Embedding cache: a bounded in-process LRU tier in front of a persistent store.
+
+The memory tier holds up to EMB_CACHE_MEM_BYTES of vectors per process and is
+shared by every embedder. The persistent vectors are float32 blobs in SQLite files under EMB_CACHE_DIR, spread over
+EMB_CACHE_SHARDS databases by key so concurrent writers (threads or processes)
+rarely contend for the same file. Each shard runs in WAL mode and is capped at
+EMB_CACHE_MAX_BYTES / EMB_CACHE_SHARDS, evicting least recently used entries.
+Keys are sha256(model + "\\n" + text), the same as the legacy one-JSON-file-per-
+vector layout, which migrate_json_cache imports.
+"""
 import hashlib
+import logging
 import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
 import orjson
-import tempfile
-import shutil
+
+logger = logging.getLogger(__name__)
 
 CACHE_DIR = os.environ.get("EMB_CACHE_DIR", ".embcache")
+CACHE_SHARDS = max(1, int(os.environ.get("EMB_CACHE_SHARDS", "8")))
+CACHE_MAX_BYTES = int(float(os.environ.get("EMB_CACHE_MAX_BYTES", str(10 * 1024 ** 3))))  # 0 disables the cap
+CACHE_MEM_BYTES = int(float(os.environ.get("EMB_CACHE_MEM_BYTES", str(256 * 1024 ** 2))))  # 0 disables
 os.makedirs(CACHE_DIR, exist_ok=True)
 
-def _key(text: str, model: str) -> str:
+_DTYPE = np.dtype("<f4")
+_ATIME_RESOLUTION = 300_000  # ms; hits refresh atime at most this often, keeping reads mostly read-only
+_EVICT_FRACTION = 0.1  # share of a shard's rows dropped per eviction pass
+_SQL_CHUNK = 500  # keys per IN (...) query, below SQLite's bound-parameter limit
+
+_local = threading.local()
+
+def _hash(text: str, model: str) -> bytes:
     s = (model or "") + "\n" + (text or "")
-    h = hashlib.sha256(s.encode("utf-8")).hexdigest()
-    return os.path.join(CACHE_DIR, f"{h}.json")
+    return hashlib.sha256(s.encode("utf-8")).digest()
+
+class _MemoryLRU:
+    """Thread-safe LRU of key -> float32 vector, bounded by total vector bytes."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = self.misses = self.evictions = 0
+        self._items: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: Sequence[bytes]) -> Dict[bytes, np.ndarray]:
+        found: Dict[bytes, np.ndarray] = {}
+        with self._lock:
+            for k in keys:
+                v = self._items.get(k)
+                if v is None:
+                    self.misses += 1
+                    continue
+                self._items.move_to_end(k)
+                found[k] = v
+                self.hits += 1
+        return found
+
+    def put_many(self, items: Iterable[Tuple[bytes, np.ndarray]]):
+        if self.max_bytes <= 0:
+            return
+        with self._lock:
+            for k, v in items:
+                old = self._items.pop(k, None)
+                if old is not None:
+                    self.bytes -= old.nbytes
+                if v.nbytes > self.max_bytes:
+                    continue
+                self._items[k] = v
+                self.bytes += v.nbytes
+            while self.bytes > self.max_bytes:
+                _, v = self._items.popitem(last=False)
+                self.bytes -= v.nbytes
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"mem_entries": len(self._items), "mem_bytes": self.bytes, "mem_max_bytes": self.max_bytes,
+                    "mem_hits": self.hits, "mem_misses": self.misses, "mem_evictions": self.evictions}
+
+_memory = _MemoryLRU(CACHE_MEM_BYTES)
+
+def _shard(key: bytes) -> int:
+    return key[0] % CACHE_SHARDS
+
+def _conn(shard: int) -> sqlite3.Connection:
+    """One connection per thread and shard (sqlite3 connections are not shared across threads)."""
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    conn = conns.get(shard)
+    if conn is None:
+        path = os.path.join(CACHE_DIR, f"cache-{shard:02d}.sqlite")
+        conn = sqlite3.connect(path, timeout=30.0, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""CREATE TABLE IF NOT EXISTS vectors(
+            key BLOB PRIMARY KEY, vec BLOB NOT NULL, atime INTEGER NOT NULL) WITHOUT ROWID""")  # atime: epoch ms
+        conn.execute("CREATE INDEX IF NOT EXISTS vectors_atime_idx ON vectors(atime)")
+        conns[shard] = conn
+    return conn
+
+def _by_shard(keys: Iterable[bytes]) -> Dict[int, List[bytes]]:
+    groups: Dict[int, List[bytes]] = {}
+    for k in keys:
+        groups.setdefault(_shard(k), []).append(k)
+    return groups
+
+def _get_keys(keys: Sequence[bytes]) -> Dict[bytes, bytes]:
+    found: Dict[bytes, bytes] = {}
+    now = int(time.time() * 1000)
+    for shard, group in _by_shard(dict.fromkeys(keys)).items():
+        conn = _conn(shard)
+        for i in range(0, len(group), _SQL_CHUNK):
+            part = group[i:i + _SQL_CHUNK]
+            marks = ",".join("?" * len(part))
+            rows = conn.execute(f"SELECT key, vec, atime FROM vectors WHERE key IN ({marks})", part).fetchall()
+            stale = [k for k, _, atime in rows if atime < now - _ATIME_RESOLUTION]
+            found.update((k, v) for k, v, _ in rows)
+            if stale:
+                conn.executemany("UPDATE vectors SET atime = ? WHERE key = ?", [(now, k) for k in stale])
+    return found
+
+def _set_keys(items: Sequence[Tuple[bytes, bytes]]):
+    now = int(time.time() * 1000)
+    for shard, group in _by_shard(dict.fromkeys(k for k, _ in items)).items():
+        wanted = set(group)
+        conn = _conn(shard)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany("INSERT OR REPLACE INTO vectors(key, vec, atime) VALUES (?, ?, ?)",
+                             [(k, v, now) for k, v in items if k in wanted])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        _enforce_cap(conn)
+
+def _used_bytes(conn: sqlite3.Connection) -> int:
+    pages = conn.execute("PRAGMA page_count").fetchone()[0]
+    free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return (pages - free) * conn.execute("PRAGMA page_size").fetchone()[0]
+
+def _enforce_cap(conn: sqlite3.Connection):
+    """Drop the least recently used rows while the shard is over its share of EMB_CACHE_MAX_BYTES."""
+    if CACHE_MAX_BYTES <= 0:
+        return
+    cap = CACHE_MAX_BYTES // CACHE_SHARDS
+    evicted = 0
+    while _used_bytes(conn) > cap:
+        n = conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+        if n == 0:
+            break
+        drop = max(1, int(n * _EVICT_FRACTION))
+        conn.execute("DELETE FROM vectors WHERE key IN (SELECT key FROM vectors ORDER BY atime LIMIT ?)", (drop,))
+        evicted += drop
+    if evicted:
+        logger.info("EMB cache: evicted %d least recently used vectors", evicted)
+
+def _encode(vec) -> bytes:
+    return np.asarray(vec, dtype=_DTYPE).tobytes()
+
+def _decode(blob: bytes) -> np.ndarray:
+    return np.frombuffer(blob, dtype=_DTYPE)  # read-only; shared with the memory tier
+
+def cache_keys(texts: Iterable[str], model: str) -> List[bytes]:
+    """Cache keys for texts; compute once and pass to get_many/set_many."""
+    return [_hash(t, model) for t in texts]
+
+def get_many(keys: Sequence[bytes], remote=None) -> List[Optional[np.ndarray]]:
+    """
+    Vectors (read-only float32 arrays) for keys in order; None for misses. The
+    memory tier is checked first, then disk, then `remote` (a RemoteCache from
+    remote_cache.py) if given; hits are promoted into the faster tiers.
+    """
+    found = _memory.get_many(keys)
+    rest = [k for k in keys if k not in found]
+    if rest:
+        disk = {k: _decode(v) for k, v in _get_keys(rest).items()}
+        _memory.put_many(disk.items())
+        found.update(disk)
+        rest = [k for k in rest if k not in disk]
+    if rest and remote is not None:
+        blobs = remote.get_many(rest)
+        if blobs:
+            _set_keys(list(blobs.items()))
+            fetched = {k: _decode(v) for k, v in blobs.items()}
+            _memory.put_many(fetched.items())
+            found.update(fetched)
+    return [found.get(k) for k in keys]
+
+def set_many(items: Iterable[Tuple[bytes, object]], remote=None):
+    """
+    Write (key, vec) pairs to memory and disk (one transaction per shard) and,
+    if given, queue them for the `remote` tier (written behind).
+    """
+    rows = [(k, _decode(_encode(v))) for k, v in items]
+    if rows:
+        _memory.put_many(rows)
+        blobs = [(k, v.tobytes()) for k, v in rows]
+        _set_keys(blobs)
+        if remote is not None:  # zero placeholders (dry runs, call caps) stay local
+            remote.put_many([b for b, (_, v) in zip(blobs, rows) if v.any()])
 
 def get_cached(text: str, model: str):
-    path = _key(text, model)
-    if os.path.exists(path):
-        with open(path, "rb") as f:
-            return orjson.loads(f.read())
-    return None
+    return get_many([_hash(text, model)])[0]
 
 def set_cached(text: str, model: str, vec):
-    path = _key(text, model)
-    td = tempfile.mkdtemp(prefix="embcache-")
-    try:
-        tmp = os.path.join(td, "vec.json")
-        with open(tmp, "wb") as f:
-            f.write(orjson.dumps(vec))
-        shutil.move(tmp, path)
-    finally:
-        shutil.rmtree(td, ignore_errors=True)
\ No newline at end of file
+    set_many([(_hash(text, model), vec)])
+
+def get_cached_many(texts, model: str) -> list:
+    """Cached vectors (float32 arrays) for texts in order; None for misses."""
+    return get_many(cache_keys(texts, model))
+
+def set_cached_many(items, model: str):
+    """Write (text, vec) pairs to the cache."""
+    set_many((_hash(t, model), v) for t, v in items)
+
+def cache_stats() -> Dict[str, int]:
+    entries = used = 0
+    for shard in range(CACHE_SHARDS):
+        conn = _conn(shard)
+        entries += conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+        used += _used_bytes(conn)
+    return {"entries": entries, "bytes": used, "shards": CACHE_SHARDS, "max_bytes": CACHE_MAX_BYTES,
+            **_memory.stats()}
+
+def memory_stats() -> Dict[str, int]:
+    """Hit/miss/eviction counters and size of the in-process tier."""
+    return _memory.stats()
+
+def migrate_json_cache(src_dir: Optional[str] = None, remove: bool = False, batch: int = 5000) -> int:
+    """
+    Import legacy `{sha256}.json` vector files into the SQLite store (the file name
+    is the key, so no text is needed). With `remove`, imported files are deleted.
+    Returns the number of vectors imported.
+    """
+    src_dir = src_dir or CACHE_DIR
+    pending: List[Tuple[bytes, bytes]] = []
+    paths: List[str] = []
+    total = 0
+
+    def flush():
+        nonlocal total
+        if pending:
+            _set_keys(pending)
+            total += len(pending)
+            if remove:
+                for p in paths:
+                    os.remove(p)
+            pending.clear()
+            paths.clear()
+            logger.info("EMB cache: migrated %d vectors", total)
+
+    with os.scandir(src_dir) as it:
+        for entry in it:
+            name = entry.name
+            if not name.endswith(".json") or len(name) != 69:
+                continue
+            try:
+                key = bytes.fromhex(name[:64])
+                with open(entry.path, "rb") as f:
+                    vec = orjson.loads(f.read())
+            except (ValueError, OSError, orjson.JSONDecodeError) as e:
+                logger.warning("EMB cache: skipping %s: %s", name, e)
+                continue
+            pending.append((key, _encode(vec)))
+            paths.append(entry.path)
+            if len(pending) >= batch:
+                flush()
+    flush()
+    return total
@@ -1,9 +1,12 @@
 # src/verticalizer/embeddings/gemini_client.py
 import os
-import time
 import hashlib
 import logging
-from typing import List, Tuple
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
 
 try:
     from tqdm.rich import tqdm
@@ -13,9 +16,13 @@ except Exception:
 
 from google import genai
 from google.genai import types
+from google.api_core import exceptions as gexceptions
 from google.api_core import retry as gretry
 
-from .cache import get_cached, set_cached
+from .cache import cache_keys, get_many, set_many
+from .neardup import EMB_NEARDUP, NearDupIndex, simhash
+from .ratelimit import AIMDConcurrency, TokenBucket
+from .remote_cache import remote_cache
 
 logger = logging.getLogger(__name__)
 
@@ -25,99 +32,238 @@ EMBED_DIM = int(os.getenv("GEMINI_EMB_DIM", "768"))
 TASK_TYPE = os.getenv("GEMINI_TASK_TYPE", "classification")
 DRYRUN = bool(int(os.getenv("GEMINI_EMB_DRYRUN", "0")))
 MAX_CALLS = int(os.getenv("GEMINI_EMB_MAX_CALLS", "0"))
-RATE_LIMIT_QPS = float(os.getenv("GEMINI_EMB_RATELIMIT", "0"))
+RATE_LIMIT_QPS = float(os.getenv("GEMINI_EMB_RATELIMIT", os.getenv("GEMINI_EMB_RATE_LIMIT", "0")))
+RATE_LIMIT_FILE = os.getenv("GEMINI_EMB_RATELIMIT_FILE", "")  # share the QPS budget across processes
+CONCURRENCY = int(os.getenv("GEMINI_EMB_CONCURRENCY", "1"))  # max in-flight requests (AIMD-adjusted)
+BATCH_ITEMS = int(os.getenv("GEMINI_EMB_BATCH_ITEMS", "100"))  # contents per embed_content request
+BATCH_CHARS = int(os.getenv("GEMINI_EMB_BATCH_CHARS", "200000"))  # characters per request (~4 chars/token)
+MAX_TEXT_CHARS = 100000
 
 if not GEMINI_API_KEY and not DRYRUN:
     raise RuntimeError("GEMINI_API_KEY not set in env")
 
 client = genai.Client(api_key=GEMINI_API_KEY) if GEMINI_API_KEY else None
 
-_last_call_ts = 0.0
+_bucket = TokenBucket(RATE_LIMIT_QPS, lock_path=RATE_LIMIT_FILE)
 
 def _rate_limit():
-    global _last_call_ts
-    if RATE_LIMIT_QPS > 0:
-        min_interval = 1.0 / RATE_LIMIT_QPS
-        now = time.time()
-        wait = min_interval - (now - _last_call_ts)
-        if wait > 0:
-            time.sleep(wait)
-        _last_call_ts = time.time()
+    _bucket.acquire()
 
 def _is_retriable(exc: Exception) -> bool:
+    if isinstance(exc, gexceptions.RetryError):  # deadline hit while retrying 429/503
+        return True
     code = getattr(exc, "code", None)
     return code in (429, 503)
 
+def _is_payload_error(exc: Exception) -> bool:
+    """Errors caused by the request contents (size, bad text, short response), worth retrying on smaller batches."""
+    code = getattr(exc, "code", None)
+    return code in (400, 413) or isinstance(exc, ValueError)
+
+def _batches(texts: List[str], max_items: int = BATCH_ITEMS, max_chars: int = BATCH_CHARS) -> List[List[str]]:
+    """Greedy packing in input order under an item cap and a character budget; an oversized text goes alone."""
+    out: List[List[str]] = []
+    cur: List[str] = []
+    size = 0
+    for t in texts:
+        n = min(len(t), MAX_TEXT_CHARS)
+        if cur and (len(cur) >= max_items or size + n > max_chars):
+            out.append(cur)
+            cur, size = [], 0
+        cur.append(t)
+        size += n
+    if cur:
+        out.append(cur)
+    return out
+
 class GeminiEmbedder:
     def __init__(self, model: str = MODEL, task_type: str = TASK_TYPE, embeddim: int = EMBED_DIM):
         self.model = model
         self.task_type = task_type
         self.embeddim = embeddim
         self.calls = 0
+        self.neardup_reused = 0  # API calls avoided by reusing a near-duplicate's vector
         self.retry = gretry.Retry(predicate=_is_retriable, deadline=300.0)
+        self.concurrency = AIMDConcurrency(max(1, CONCURRENCY))
+        self._calls_lock = threading.Lock()
+        self.remote = remote_cache(model, task_type, embeddim)
+
+    def _on_retry_error(self, exc: Exception):
+        if _is_retriable(exc):
+            self.concurrency.on_throttle()
 
-    def embed_text(self, text: str) -> List[float]:
+    def _zeros(self) -> np.ndarray:
+        return np.zeros(self.embeddim, dtype=np.float32)
+
+    def embed_text(self, text: str) -> np.ndarray:
+        """float32 vector for one text (zeros for an empty text)."""
         if not text or not str(text).strip():
-            return [0.0] * self.embeddim
+            return self._zeros()
 
         norm = str(text).strip()
-        cached = get_cached(norm, self.model)
+        key = cache_keys([norm], self.model)[0]
+        cached = get_many([key], remote=self.remote)[0]
         if cached is not None:
             return cached
 
         if DRYRUN:
-            vec = [0.0] * self.embeddim
-            set_cached(norm, self.model, vec)
+            vec = self._zeros()
+            set_many([(key, vec)], remote=self.remote)
             return vec
 
         if MAX_CALLS and self.calls >= MAX_CALLS:
-            vec = [0.0] * self.embeddim
-            set_cached(norm, self.model, vec)
+            vec = self._zeros()
+            set_many([(key, vec)], remote=self.remote)
             return vec
 
-        _rate_limit()
         try:
-            resp = client.models.embed_content(
-                model=self.model,
-                contents=norm[:100000],
-                config=types.EmbedContentConfig(task_type=self.task_type),
-            )
+            vec = self.retry(self._request, on_error=self._on_retry_error)([norm])[0]
         except Exception as e:
             snip = hashlib.sha1(norm.encode("utf-8")).hexdigest()[:8]
             logger.error("GeminiEmbedder: failed to embed text %s: %s", snip, e)
             raise
+        set_many([(key, vec)], remote=self.remote)
+        return vec
 
-        if not getattr(resp, "embeddings", None) or not hasattr(resp.embeddings, "values"):
-            raise ValueError(f"GeminiEmbedder: no embedding values for model {self.model}")
+    def _request(self, texts: List[str]) -> List[np.ndarray]:
+        """One embed_content call for several contents; returns one float32 vector per text, in order."""
+        _rate_limit()
+        resp = client.models.embed_content(
+            model=self.model,
+            contents=[t[:MAX_TEXT_CHARS] for t in texts],
+            config=types.EmbedContentConfig(task_type=self.task_type),
+        )
+        with self._calls_lock:
+            self.calls += 1
+        embs = getattr(resp, "embeddings", None) or []
+        if len(embs) != len(texts) or any(not getattr(e, "values", None) for e in embs):
+            raise ValueError(f"GeminiEmbedder: got {len(embs)} embeddings for {len(texts)} texts from model {self.model}")
+        return [np.asarray(e.values, dtype=np.float32) for e in embs]
 
-        vec = list(resp.embeddings.values)
-        set_cached(norm, self.model, vec)
-        self.calls += 1
-        return vec
+    def _embed_batch(self, texts: List[str], top: bool = True) -> List[Optional[np.ndarray]]:
+        """
+        Embed one packed batch. A request rejected for its contents (400/413, or a
+        short response) is split in halves and each half retried, down to single
+        texts; a single text that still fails yields None (logged, not cached)
+        instead of failing the whole job. Any other error (throttling, including
+        a retry deadline exceeded under sustained 429/503, auth, permission,
+        unknown model) propagates, as does a payload error that every
+        text of the batch hits on its own, since that points at the request rather
+        than at the texts.
+        """
+        if MAX_CALLS and self.calls >= MAX_CALLS:
+            return [self._zeros() for _ in texts]
+        try:
+            with self.concurrency.slot():
+                vecs: List[Optional[np.ndarray]] = list(
+                    self.retry(self._request, on_error=self._on_retry_error)(texts))
+            self.concurrency.on_success()
+            return vecs
+        except Exception as e:
+            if _is_retriable(e) or not _is_payload_error(e):
+                raise
+            if len(texts) == 1:
+                snip = hashlib.sha1(texts[0].encode("utf-8")).hexdigest()[:8]
+                logger.error("GeminiEmbedder: failed to embed text %s: %s", snip, e)
+                return [None]
+            logger.warning("GeminiEmbedder: batch of %d failed (%s); splitting", len(texts), e)
+            mid = len(texts) // 2
+            vecs = self._embed_batch(texts[:mid], top=False) + self._embed_batch(texts[mid:], top=False)
+            if top and all(v is None for v in vecs):
+                raise
+            return vecs
+
+    def embed_many(self, texts: List[str], show_progress: bool = False,
+                   keys: Optional[List[bytes]] = None) -> Dict[str, Optional[np.ndarray]]:
+        """
+        Embed distinct non-empty texts (already normalized, not cached) in packed
+        multi-content requests, up to GEMINI_EMB_CONCURRENCY at a time; each
+        batch's results are written to the cache in bulk under `keys` (from
+        cache_keys; computed if not given). Texts that could not be embedded map
+        to None.
+        """
+        out: Dict[str, Optional[np.ndarray]] = {}
+        keymap = dict(zip(texts, keys if keys is not None else cache_keys(texts, self.model)))
+        batches = _batches(texts)
+
+        def one(batch: List[str]) -> List[Optional[np.ndarray]]:
+            vecs: List[Optional[np.ndarray]]
+            if DRYRUN:
+                vecs = [self._zeros() for _ in batch]
+            else:
+                vecs = self._embed_batch(batch)
+            set_many([(keymap[t], v) for t, v in zip(batch, vecs) if v is not None], remote=self.remote)
+            return vecs
+
+        workers = max(1, min(self.concurrency.max_limit, len(batches)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gemini-emb") as pool:
+            results = pool.map(one, batches)
+            if show_progress:
+                results = tqdm(results, total=len(batches), desc="Embedding unique texts", unit="batch")
+            for batch, vecs in zip(batches, results):
+                out.update(zip(batch, vecs))
+        failed = sum(1 for v in out.values() if v is None)
+        if texts:
+            logger.info("GeminiEmbedder: embedded %d texts in %d requests (concurrency %d, throttled %d)%s",
+                        len(texts), len(batches), int(self.concurrency.limit), self.concurrency.throttled,
+                        f", {failed} failed" if failed else "")
+        return out
 
-    def embed_texts_dedup(self, texts: List[str], show_progress: bool = True) -> List[List[float]]:
+    def embed_texts_dedup(self, texts: List[str], show_progress: bool = True,
+                          fill_failed: bool = True) -> List[Optional[np.ndarray]]:
+        """
+        float32 vectors for texts in input order; empty texts get zero vectors. Texts that
+        could not be embedded get zero vectors too, or None with `fill_failed=False`
+        so callers that persist vectors can skip them.
+        """
         # normalize and de-duplicate
         order: List[Tuple[int, str]] = []
-        unique_map = {}
+        unique_map: Dict[str, Optional[np.ndarray]] = {}
         for i, t in enumerate(texts):
             nt = (t if isinstance(t, str) else "").strip()
             order.append((i, nt))
             if nt not in unique_map:
                 unique_map[nt] = None
 
-        # cache hits
+        # cache hits; each text is hashed once and its key reused for the write-back
         cached_hits = 0
-        for nt in list(unique_map.keys()):
-            cv = get_cached(nt, self.model)
+        uniq = list(unique_map.keys())
+        keymap = dict(zip(uniq, cache_keys(uniq, self.model)))
+        for nt, cv in zip(uniq, get_many([keymap[nt] for nt in uniq], remote=self.remote)):
             if cv is not None:
                 unique_map[nt] = cv
                 cached_hits += 1
 
-        # misses
+        # misses; with EMB_NEARDUP a miss whose SimHash is within EMB_NEARDUP_MAX_DIST
+        # bits of an already-embedded (or already-queued) text reuses that vector
+        # instead of calling the API; the rest are embedded in packed batches
         misskeys = [nt for nt, v in unique_map.items() if v is None]
-        iterator = tqdm(misskeys, desc="Embedding unique texts", unit="doc") if show_progress else misskeys
-        for nt in iterator:
-            unique_map[nt] = self.embed_text(nt)
+        index: Optional[NearDupIndex[str]] = NearDupIndex() if EMB_NEARDUP else None
+        if index is not None:
+            for nt, v in unique_map.items():
+                if v is not None and index.eligible(nt):
+                    index.add(simhash(nt), nt)
+        aliases: Dict[str, str] = {}
+        pending: List[str] = []
+        for nt in misskeys:
+            if not nt:
+                continue
+            if index is not None and index.eligible(nt):
+                h = simhash(nt)
+                match = index.query(h)
+                if match is not None:
+                    aliases[nt] = match[0]
+                    continue
+                index.add(h, nt)
+            pending.append(nt)
+        unique_map.update(self.embed_many(pending, show_progress=show_progress,
+                                          keys=[keymap[nt] for nt in pending]))
+        for nt, src in aliases.items():
+            unique_map[nt] = unique_map.get(src)
+        reused = len(aliases)
+        self.neardup_reused += reused
+        if reused:
+            logger.info("GeminiEmbedder: near-duplicate reuse avoided %d/%d API calls", reused, len(misskeys))
 
         total_unique = len(unique_map)
         if total_unique:
@@ -125,9 +271,11 @@ class GeminiEmbedder:
             logger.info("GeminiEmbedder: cache hits %d/%d (%.1f%%) on unique texts", cached_hits, total_unique, 100*hitrate)
 
         # map back to original order
-        out = []
+        out: List[Optional[np.ndarray]] = []
         for _, nt in order:
-            vec = unique_map.get(nt) or ([0.0] * self.embeddim)
+            vec = unique_map.get(nt)
+            if vec is None and (fill_failed or not nt):
+                vec = self._zeros()
             out.append(vec)
         return out
 
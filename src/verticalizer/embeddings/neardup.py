@@ -0,0 +1,85 @@
+# src/verticalizer/embeddings/neardup.py
+import hashlib
+import os
+import re
+from typing import Dict, Generic, List, Optional, Tuple, TypeVar
+import numpy as np
+
+EMB_NEARDUP = bool(int(os.getenv("EMB_NEARDUP", "0")))  # opt-in: reuse is lossy
+EMB_NEARDUP_MAX_DIST = int(os.getenv("EMB_NEARDUP_MAX_DIST", "3"))  # Hamming bits out of 64
+EMB_NEARDUP_MIN_CHARS = int(os.getenv("EMB_NEARDUP_MIN_CHARS", "200"))  # shorter texts are never matched
+
+_TOKEN = re.compile(r"\w+", re.U)
+_SHINGLE = 3
+_MASK = (1 << 64) - 1
+
+K = TypeVar("K")
+
+def _h64(s: str) -> int:
+    return int.from_bytes(hashlib.blake2b(s.encode("utf-8", errors="ignore"), digest_size=8).digest(), "big")
+
+def simhash(text: str) -> int:
+    """64-bit SimHash over word 3-shingles (lowercased), weighted by shingle count."""
+    tokens = [t.lower() for t in _TOKEN.findall(text or "")]
+    if len(tokens) < _SHINGLE:
+        shingles = [" ".join(tokens)] if tokens else []
+    else:
+        shingles = [" ".join(tokens[i:i + _SHINGLE]) for i in range(len(tokens) - _SHINGLE + 1)]
+    counts: Dict[str, int] = {}
+    for s in shingles:
+        counts[s] = counts.get(s, 0) + 1
+    if not counts:
+        return 0
+    hs = np.array([_h64(s) for s in counts], dtype=np.uint64)
+    w = np.array(list(counts.values()), dtype=np.int64)
+    bits = ((hs[:, None] >> np.arange(64, dtype=np.uint64)) & np.uint64(1)).astype(np.int64)
+    acc = (w[:, None] * (2 * bits - 1)).sum(axis=0)
+    out = 0
+    for bit in np.flatnonzero(acc > 0):
+        out |= 1 << int(bit)
+    return out
+
+def hamming(a: int, b: int) -> int:
+    return ((a ^ b) & _MASK).bit_count()
+
+class NearDupIndex(Generic[K]):
+    """
+    Banded SimHash index. The 64 bits are split into max_dist + 1 bands; two hashes
+    within max_dist bits must agree exactly on at least one band (pigeonhole), so
+    lookups only compare candidates sharing a band instead of scanning everything.
+    """
+
+    def __init__(self, max_dist: int = EMB_NEARDUP_MAX_DIST, min_chars: int = EMB_NEARDUP_MIN_CHARS):
+        self.max_dist = max(0, max_dist)
+        self.min_chars = min_chars
+        nbands = self.max_dist + 1
+        width = 64 // nbands
+        self._bands: List[Tuple[int, int]] = [
+            (i * width, (64 - i * width) if i == nbands - 1 else width) for i in range(nbands)
+        ]
+        self._tables: List[Dict[int, List[Tuple[int, K]]]] = [{} for _ in self._bands]
+        self.size = 0
+
+    def eligible(self, text: str) -> bool:
+        return len(text or "") >= self.min_chars
+
+    def _keys(self, h: int):
+        for i, (shift, width) in enumerate(self._bands):
+            yield i, (h >> shift) & ((1 << width) - 1)
+
+    def add(self, h: int, key: K):
+        for i, band in self._keys(h):
+            self._tables[i].setdefault(band, []).append((h, key))
+        self.size += 1
+
+    def query(self, h: int) -> Optional[Tuple[K, int]]:
+        """Closest indexed key within max_dist as (key, distance), else None."""
+        best: Optional[Tuple[K, int]] = None
+        for i, band in self._keys(h):
+            for other, key in self._tables[i].get(band, ()):
+                d = hamming(h, other)
+                if d <= self.max_dist and (best is None or d < best[1]):
+                    best = (key, d)
+                    if d == 0:
+                        return best
+        return best
@@ -0,0 +1,134 @@
+# src/verticalizer/embeddings/ratelimit.py
+"""
+Client-side throttling for embedding APIs.
+
+TokenBucket spaces requests to a QPS budget across threads and, with a lock
+file, across processes on the same host. AIMDConcurrency bounds in-flight
+requests and adapts the bound: additive increase while calls succeed,
+multiplicative decrease when the provider throttles (429/503).
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX: thread-level limiting only
+    fcntl = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """
+    `rate` tokens per second with up to `burst` saved up; acquire() blocks until a
+    token is available. rate <= 0 disables limiting. With `lock_path`, the bucket
+    state lives in that file under an exclusive flock so every process using the
+    same path shares one budget.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None, lock_path: Optional[str] = None):
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst if burst is not None else max(1.0, self.rate)))
+        self.lock_path = lock_path or None
+        if self.lock_path and fcntl is None:
+            logger.warning("TokenBucket: file locking unavailable; %s limits this process only", self.lock_path)
+            self.lock_path = None
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._ts = time.monotonic()
+
+    def _take(self, state):
+        """(tokens, ts) -> (new state, seconds to wait or 0 if a token was taken)."""
+        tokens, ts = state
+        now = time.time() if self.lock_path else time.monotonic()
+        tokens = min(self.burst, tokens + max(0.0, now - ts) * self.rate)
+        if tokens >= 1.0:
+            return (tokens - 1.0, now), 0.0
+        return (tokens, now), (1.0 - tokens) / self.rate
+
+    def _take_shared(self, lock_path: str) -> float:
+        with open(lock_path, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                parts = f.read().split()
+                state = (float(parts[0]), float(parts[1])) if len(parts) == 2 else (self.burst, time.time())
+                state, wait = self._take(state)
+                f.seek(0)
+                f.truncate()
+                f.write(f"{state[0]:.6f} {state[1]:.6f}")
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        return wait
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                if self.lock_path:
+                    wait = self._take_shared(self.lock_path)
+                else:
+                    (self._tokens, self._ts), wait = self._take((self._tokens, self._ts))
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+class AIMDConcurrency:
+    """
+    A semaphore whose size adapts between `min_limit` and `max_limit`: +1 after
+    about `limit` consecutive successes, x`decrease` on throttling (at most once
+    per `cooldown` seconds, so one burst of 429s counts once).
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = 1, initial: Optional[int] = None,
+                 decrease: float = 0.5, cooldown: float = 2.0):
+        self.max_limit = max(1, int(max_limit))
+        self.min_limit = max(1, min(int(min_limit), self.max_limit))
+        self.limit = float(min(self.max_limit, initial or self.max_limit))
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.inflight = 0
+        self.throttled = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.inflight >= int(self.limit):
+                self._cond.wait()
+            self.inflight += 1
+
+    def release(self):
+        with self._cond:
+            self.inflight -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def on_success(self):
+        with self._cond:
+            if self.limit < self.max_limit:
+                self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+                self._cond.notify_all()
+
+    def on_throttle(self):
+        with self._cond:
+            self.throttled += 1
+            now = time.monotonic()
+            if now - self._last_decrease < self.cooldown:
+                return
+            self._last_decrease = now
+            old = int(self.limit)
+            self.limit = max(float(self.min_limit), self.limit * self.decrease)
+            if int(self.limit) < old:
+                logger.info("AIMD: throttled; concurrency %d -> %d", old, int(self.limit))
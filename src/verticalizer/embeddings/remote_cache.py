@@ -0,0 +1,193 @@
+# src/verticalizer/embeddings/remote_cache.py
+"""
+Shared (remote) embedding cache tier behind the local cache.
+
+Entries are keyed by (model, task type, dim, text hash) and stored as raw
+little-endian float32 bytes, either in the Postgres `embcache` table or as
+objects under `embcache/` in the configured bucket (EMB_REMOTE_CACHE=postgres|s3).
+Reads go through in batches when the local tiers miss; writes are queued and
+flushed by a background thread in batches (write-behind), so embedding never
+waits on the remote store.
+"""
+import atexit
+import logging
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+REMOTE_CACHE = os.environ.get("EMB_REMOTE_CACHE", "").strip().lower()  # "", "postgres" or "s3"
+REMOTE_BATCH = int(os.environ.get("EMB_REMOTE_CACHE_BATCH", "500"))  # entries per remote read/write
+REMOTE_FLUSH_SECONDS = float(os.environ.get("EMB_REMOTE_CACHE_FLUSH_SECONDS", "2.0"))
+S3_PREFIX = "embcache/"
+
+class PostgresBackend:
+    """embcache table via storage.repositories."""
+
+    def __init__(self):
+        from ..storage.repositories import create_embcache_table_if_missing
+        create_embcache_table_if_missing()
+
+    def get_many(self, ns: Tuple[str, str, int], hashes: Sequence[bytes]) -> Dict[bytes, bytes]:
+        from ..storage.repositories import embcache_get_many
+        return embcache_get_many(*ns, list(hashes))
+
+    def put_many(self, ns: Tuple[str, str, int], items: List[Tuple[bytes, bytes]]):
+        from ..storage.repositories import embcache_put_many
+        embcache_put_many(*ns, items)
+
+class S3Backend:
+    """One object per vector under embcache/{model}/{task}/{dim}/{hh}/{hash}.f32 via storage.s3."""
+
+    def _key(self, ns: Tuple[str, str, int], h: bytes) -> str:
+        model, task, dim = ns
+        hexh = h.hex()
+        return f"{S3_PREFIX}{re.sub(r'[^A-Za-z0-9._-]+', '_', model)}/{task}/{dim}/{hexh[:2]}/{hexh}.f32"
+
+    def get_many(self, ns: Tuple[str, str, int], hashes: Sequence[bytes]) -> Dict[bytes, bytes]:
+        from ..storage.s3 import get_many
+        keys = {self._key(ns, h): h for h in hashes}
+        return {keys[k]: v for k, v in get_many(list(keys)).items() if v}
+
+    def put_many(self, ns: Tuple[str, str, int], items: List[Tuple[bytes, bytes]]):
+        from ..storage.s3 import put_many
+        put_many([(self._key(ns, h), v, "application/octet-stream") for h, v in items], skip_existing=True)
+
+_BACKENDS = {"postgres": PostgresBackend, "s3": S3Backend}
+
+class RemoteCache:
+    """
+    One embedder's view of the shared tier: namespace (model, task type, dim) plus
+    a write-behind queue. get_many reads through in REMOTE_BATCH chunks; put_many
+    only enqueues. Remote failures are logged and treated as misses / dropped
+    writes, never raised into the embedding path. flush() drains the queue (also
+    run at exit).
+    """
+
+    def __init__(self, backend, model: str, task_type: str, dim: int,
+                 batch: int = REMOTE_BATCH, flush_seconds: float = REMOTE_FLUSH_SECONDS):
+        self.backend = backend
+        self.ns = (model, task_type or "", int(dim))
+        self.batch = max(1, batch)
+        self.flush_seconds = flush_seconds
+        self.hits = self.misses = self.written = self.errors = 0
+        self._pending: Dict[bytes, bytes] = {}
+        self._cond = threading.Condition()
+        self._flushing = False
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="emb-remote-cache", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def get_many(self, hashes: Sequence[bytes]) -> Dict[bytes, bytes]:
+        found: Dict[bytes, bytes] = {}
+        with self._cond:
+            for h in hashes:
+                if h in self._pending:  # queued but not yet written
+                    found[h] = self._pending[h]
+        rest = [h for h in dict.fromkeys(hashes) if h not in found]
+        for i in range(0, len(rest), self.batch):
+            part = rest[i:i + self.batch]
+            try:
+                found.update(self.backend.get_many(self.ns, part))
+            except Exception as e:
+                self.errors += 1
+                logger.warning("EMB remote cache: read of %d entries failed: %s", len(part), e)
+        self.hits += len(found)
+        self.misses += len(hashes) - len(found)
+        return found
+
+    def put_many(self, items: Sequence[Tuple[bytes, bytes]]):
+        with self._cond:
+            self._pending.update(items)
+            if len(self._pending) >= self.batch:
+                self._cond.notify_all()
+
+    def _write(self, items: List[Tuple[bytes, bytes]]):
+        for i in range(0, len(items), self.batch):
+            part = items[i:i + self.batch]
+            try:
+                self.backend.put_many(self.ns, part)
+                self.written += len(part)
+            except Exception as e:
+                self.errors += 1
+                logger.warning("EMB remote cache: write of %d entries failed: %s", len(part), e)
+
+    def _drain(self):
+        """Write out everything queued; entries stay readable from the queue until written."""
+        with self._cond:
+            while self._flushing:
+                self._cond.wait()
+            if not self._pending:
+                return
+            self._flushing = True
+            items = list(self._pending.items())
+        try:
+            self._write(items)
+        finally:
+            with self._cond:
+                for h, _ in items:
+                    self._pending.pop(h, None)
+                self._flushing = False
+                self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._closed and len(self._pending) < self.batch:
+                    self._cond.wait(self.flush_seconds)
+                closed = self._closed
+            self._drain()
+            if closed:
+                return
+
+    def flush(self):
+        self._drain()
+
+    def close(self):
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        atexit.unregister(self.close)
+        logger.info("EMB remote cache %s: %s", self.ns, self.stats())
+
+    def stats(self) -> Dict[str, int]:
+        return {"remote_hits": self.hits, "remote_misses": self.misses,
+                "remote_written": self.written, "remote_errors": self.errors}
+
+_lock = threading.Lock()
+_backend = None
+_tiers: Dict[Tuple[str, str, int], RemoteCache] = {}
+
+def remote_cache(model: str, task_type: str, dim: int, backend=None) -> Optional[RemoteCache]:
+    """
+    The process-wide RemoteCache for a namespace, or None when EMB_REMOTE_CACHE is
+    unset (and no backend is passed) or the backend cannot be set up. Pass any
+    object with get_many(ns, hashes) / put_many(ns, items) as `backend` to use a
+    different store.
+    """
+    global _backend
+    ns = (model, task_type or "", int(dim))
+    with _lock:
+        if ns in _tiers:
+            return _tiers[ns]
+        if backend is None:
+            if not REMOTE_CACHE:
+                return None
+            if _backend is None:
+                if REMOTE_CACHE not in _BACKENDS:
+                    logger.warning("EMB remote cache: unknown EMB_REMOTE_CACHE=%r; disabled", REMOTE_CACHE)
+                    return None
+                try:
+                    _backend = _BACKENDS[REMOTE_CACHE]()
+                except Exception as e:
+                    logger.warning("EMB remote cache: %s backend unavailable (%s); disabled", REMOTE_CACHE, e)
+                    return None
+            backend = _backend
+        tier = _tiers[ns] = RemoteCache(backend, *ns)
+        return tier
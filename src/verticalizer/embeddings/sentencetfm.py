@@ -1,74 +1,155 @@
 # src/verticalizer/embeddings/sentencetfm.py
 
-import hashlib
+import logging
 import os
-from typing import List, Tuple, Dict
+import re
+from typing import List, Optional, Tuple, Dict
+
+import numpy as np
 
 try:
     from sentence_transformers import SentenceTransformer
 except Exception as e:
     SentenceTransformer = None
 
-from .cache import get_cached as _get_cached, set_cached as _set_cached  # reuse existing cache interface if available
-# Fallback to gemini cache API names in repo
-try:
-    from .cache import getcached as getcached_vec, setcached as setcached_vec
-except Exception:
-    def getcached_vec(text: str, model: str):
-        return _get_cached(text, model) if '_get_cached' in globals() else None
-    def setcached_vec(text: str, model: str, vec):
-        return _set_cached(text, model, vec) if '_set_cached' in globals() else None
+from .cache import cache_keys, get_many, set_many
+
+logger = logging.getLogger(__name__)
 
 DEFAULT_MODEL = os.getenv("SENTENCE_TFM_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
 DEFAULT_DIM = int(os.getenv("SENTENCE_TFM_DIM", "384"))
 DRYRUN = bool(int(os.getenv("SENTENCE_TFM_DRYRUN", "0")))
+BATCH_SIZE = int(os.getenv("SENTENCE_TFM_BATCH", "64"))
+WORKERS = int(os.getenv("SENTENCE_TFM_WORKERS", "0"))  # >1: multi-process CPU encode pool
+BACKEND = os.getenv("SENTENCE_TFM_BACKEND", "torch")  # torch | torch-int8 | onnx | onnx-int8
+ONNX_DIR = os.getenv("SENTENCE_TFM_ONNX_DIR", ".sentencetfm-onnx")  # exported int8 ONNX models
+MAX_SEQ_LENGTH = int(os.getenv("SENTENCE_TFM_MAX_SEQ", "0"))  # 0 keeps the model default
+ENCODE_CHUNK = 4096  # texts per encode call; bounds memory, batches stay length-sorted across chunks
+
+_ONNX_QUANT = "avx2"
+_ONNX_QUANT_FILE = f"onnx/model_qint8_{_ONNX_QUANT}.onnx"
+
+def _load_onnx_int8(model_name: str):
+    """ONNX model with dynamic int8 quantization, exported once under SENTENCE_TFM_ONNX_DIR."""
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+    save_dir = os.path.join(ONNX_DIR, re.sub(r"[^A-Za-z0-9._-]+", "_", model_name))
+    if not os.path.exists(os.path.join(save_dir, _ONNX_QUANT_FILE)):
+        model = SentenceTransformer(model_name, device="cpu", backend="onnx")
+        model.save_pretrained(save_dir)
+        export_dynamic_quantized_onnx_model(model, _ONNX_QUANT, save_dir)
+        logger.info("SentenceTfm: exported int8 ONNX model to %s", save_dir)
+    return SentenceTransformer(save_dir, device="cpu", backend="onnx", model_kwargs={"file_name": _ONNX_QUANT_FILE})
+
+def _load_model(model_name: str, backend: str):
+    """Load for CPU inference; an unavailable optional backend falls back to plain torch with a warning."""
+    try:
+        if backend == "onnx":
+            return SentenceTransformer(model_name, device="cpu", backend="onnx")
+        if backend == "onnx-int8":
+            return _load_onnx_int8(model_name)
+        if backend == "torch-int8":
+            import torch
+            model = SentenceTransformer(model_name, device="cpu")
+            return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    except Exception as e:
+        logger.warning("SentenceTfm: backend %s unavailable (%s); using torch", backend, e)
+    return SentenceTransformer(model_name)
 
 class SentenceTfmEmbedder:
-    def __init__(self, model_name: str = DEFAULT_MODEL, embeddim: int = DEFAULT_DIM):
+    """
+    Local sentence-transformers embeddings (no API quota). Texts are encoded in
+    batches of `batch_size` after sorting by length, so each batch pads to
+    similar lengths; with `workers` > 1 encoding runs on a multi-process CPU pool.
+    `backend` selects plain torch, dynamic int8 torch, ONNX, or int8 ONNX. Vectors
+    from quantized/ONNX backends are cached under their own model key.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_MODEL, embeddim: int = DEFAULT_DIM,
+                 batch_size: int = BATCH_SIZE, workers: int = WORKERS, backend: str = BACKEND):
         self.model_name = model_name
         self.embeddim = embeddim
-        self.model = None if DRYRUN or SentenceTransformer is None else SentenceTransformer(model_name)
+        self.batch_size = max(1, batch_size)
+        self.workers = workers
+        self.backend = backend
+        self.cache_model = model_name if backend == "torch" else f"{model_name}@{backend}"
+        self.model = None if DRYRUN or SentenceTransformer is None else _load_model(model_name, backend)
+        if self.model is not None and MAX_SEQ_LENGTH > 0:
+            self.model.max_seq_length = MAX_SEQ_LENGTH
+        self._pool = None
+
+    def _encode(self, texts: List[str], show_progress: bool = False) -> np.ndarray:
+        """float32 (len(texts), dim), in input order."""
+        model = self.model
+        if model is None:
+            raise RuntimeError("SentenceTfm: no model loaded (dry run or sentence-transformers missing)")
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        ordered = [texts[i] for i in order]
+        parts = []
+        if self.workers > 1 and len(ordered) > self.batch_size:
+            if self._pool is None:
+                self._pool = model.start_multi_process_pool(["cpu"] * self.workers)
+            for i in range(0, len(ordered), ENCODE_CHUNK):
+                parts.append(model.encode_multi_process(ordered[i:i + ENCODE_CHUNK], self._pool,
+                                                        batch_size=self.batch_size))
+        else:
+            for i in range(0, len(ordered), ENCODE_CHUNK):
+                parts.append(model.encode(ordered[i:i + ENCODE_CHUNK], batch_size=self.batch_size,
+                                          show_progress_bar=show_progress, convert_to_numpy=True,
+                                          normalize_embeddings=False))
+        embs = np.concatenate(parts).astype(np.float32, copy=False) if parts else np.zeros((0, self.embeddim), np.float32)
+        out = np.empty_like(embs)
+        out[order] = embs
+        return out
+
+    def close(self):
+        """Stop the multi-process pool, if one was started."""
+        if self._pool is not None:
+            self.model.stop_multi_process_pool(self._pool)
+            self._pool = None
+
+    def _zeros(self) -> np.ndarray:
+        return np.zeros(self.embeddim, dtype=np.float32)
 
-    def embed_text(self, text: str) -> List[float]:
+    def embed_text(self, text: str) -> np.ndarray:
+        """float32 vector for one text (zeros for an empty text)."""
         if not text or not str(text).strip():
-            return [0.0] * self.embeddim
+            return self._zeros()
         norm = str(text).strip()
-        cached = getcached_vec(norm, self.model_name)
+        key = cache_keys([norm], self.cache_model)[0]
+        cached = get_many([key])[0]
         if cached is not None:
             return cached
         if DRYRUN or self.model is None:
-            vec = [0.0] * self.embeddim
-            setcached_vec(norm, self.model_name, vec)
+            vec = self._zeros()
+            set_many([(key, vec)])
             return vec
-        vec = self.model.encode([norm], normalize_embeddings=False).tolist()
-        setcached_vec(norm, self.model_name, vec)
+        vec = self._encode([norm])[0]
+        set_many([(key, vec)])
         return vec
 
-    def embed_texts_dedup(self, texts: List[str]) -> List[List[float]]:
+    def embed_texts_dedup(self, texts: List[str], show_progress: bool = False) -> List[np.ndarray]:
+        """float32 vectors for texts in input order; empty texts get zero vectors."""
         order: List[Tuple[int, str]] = []
-        uniq: Dict[str, List[float]] = {}
+        uniq: Dict[str, Optional[np.ndarray]] = {}
         for i, t in enumerate(texts):
             nt = str(t or "").strip()
             order.append((i, nt))
             uniq.setdefault(nt, None)
-        # Fill cache hits
-        for k in list(uniq.keys()):
-            cv = getcached_vec(k, self.model_name)
+        # Fill cache hits (one hash per text, reused for the write-back)
+        keymap = dict(zip(uniq, cache_keys(uniq, self.cache_model)))
+        for k, cv in zip(list(uniq), get_many(list(keymap.values()))):
             if cv is not None:
                 uniq[k] = cv
         # Compute misses
-        misses = [k for k, v in uniq.items() if v is None]
+        misses = [k for k, v in uniq.items() if v is None and k]
         if not DRYRUN and self.model is not None and misses:
-            embs = self.model.encode(misses, normalize_embeddings=False).tolist()
+            embs = self._encode(misses, show_progress=show_progress)
             for k, v in zip(misses, embs):
                 uniq[k] = v
-                setcached_vec(k, self.model_name, v)
-        # Fill remaining with zeros
-        for k in list(uniq.keys()):
-            if uniq[k] is None:
-                uniq[k] = [0.0] * self.embeddim
-        # Restore order
-        out: List[List[float]] = []
+            set_many((keymap[k], uniq[k]) for k in misses)
+        # Restore order, zeros for whatever is still missing
+        out: List[np.ndarray] = []
         for _, nt in order:
-            out.append(uniq.get(nt, [0.0] * self.embeddim))
-        return out
\ No newline at end of file
+            vec = uniq.get(nt)
+            out.append(vec if vec is not None else self._zeros())
+        return out
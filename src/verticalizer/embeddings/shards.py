@@ -0,0 +1,222 @@
+# src/verticalizer/embeddings/shards.py
+"""
+Append-only embedding shards.
+
+A shard is a raw little-endian float32 matrix of up to SHARD_ROWS rows
+(`{ref}.f32`, row r at byte offset r * dim * 4) plus a JSON sidecar index
+(`{ref}.json`: model, dim, rows, and the (site, shatext) of every row in order).
+Shards are written locally under EMB_SHARD_DIR, never modified once closed, and
+optionally uploaded to object storage under `embeddings/shards/{ref}`. Readers
+memory-map the local file, or fall back to range reads from object storage.
+"""
+import logging
+import os
+import re
+import time
+import uuid
+from typing import BinaryIO, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import orjson
+
+logger = logging.getLogger(__name__)
+
+SHARD_DIR = os.environ.get("EMB_SHARD_DIR", ".embshards")
+SHARD_ROWS = int(os.environ.get("EMB_SHARD_ROWS", "65536"))
+S3_PREFIX = "embeddings/shards/"
+_DTYPE = np.dtype("<f4")
+_RANGE_GAP_ROWS = 64  # merge row ranges closer than this into one range read
+
+# (site, shatext) of a row, and a row's location
+Entry = Tuple[str, str]
+RowRef = Tuple[str, int]
+
+def _slug(model: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", model or "model").strip("_")
+
+def local_path(ref: str, ext: str = ".f32") -> str:
+    return os.path.join(SHARD_DIR, ref + ext)
+
+def s3_key(ref: str, ext: str = ".f32") -> str:
+    return S3_PREFIX + ref + ext
+
+class ShardWriter:
+    """
+    Appends vectors to the current shard file. checkpoint() flushes the file and
+    reports the rows appended since the last checkpoint via
+    `on_rows(ref, first_row, entries)`, so callers can record (shard, row)
+    references long before the shard fills. Every SHARD_ROWS rows (and on close)
+    the shard is sealed: remaining rows are reported, the sidecar index is
+    written, both files are uploaded when `upload` is set, and
+    `on_sealed(ref, uploaded)` runs. A failed upload is logged and the shard stays
+    local-only (`uploaded` False, ref kept in `upload_failed`). Memory use is one
+    row, not one shard.
+    """
+
+    def __init__(self, model: str, dim: int, rows_per_shard: int = SHARD_ROWS, upload: bool = False,
+                 on_rows: Optional[Callable[[str, int, List[Entry]], None]] = None,
+                 on_sealed: Optional[Callable[[str, bool], None]] = None):
+        self.model = model
+        self.dim = int(dim)
+        self.rows_per_shard = max(1, rows_per_shard)
+        self.upload = upload
+        self.on_rows = on_rows
+        self.on_sealed = on_sealed
+        self._run = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self._seq = 0
+        self._ref: Optional[str] = None
+        self._fh: Optional[BinaryIO] = None
+        self._entries: List[Entry] = []
+        self._reported = 0
+        self.sealed: List[str] = []
+        self.upload_failed: List[str] = []
+
+    def __enter__(self) -> "ShardWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _open(self) -> Tuple[BinaryIO, str]:
+        ref = f"{_slug(self.model)}/{self._run}-{self._seq:05d}"
+        self._seq += 1
+        os.makedirs(os.path.dirname(local_path(ref)), exist_ok=True)
+        self._fh, self._ref = open(local_path(ref), "wb"), ref
+        self._entries = []
+        self._reported = 0
+        return self._fh, ref
+
+    def append(self, site: str, shatext: str, vec) -> RowRef:
+        arr = np.asarray(vec, dtype=_DTYPE).reshape(-1)
+        if arr.shape[0] != self.dim:
+            raise ValueError(f"ShardWriter: expected dim {self.dim}, got {arr.shape[0]}")
+        fh, shard = self._fh, self._ref
+        if fh is None or shard is None:
+            fh, shard = self._open()
+        fh.write(arr.tobytes())
+        self._entries.append((site, shatext))
+        ref = (shard, len(self._entries) - 1)
+        if len(self._entries) >= self.rows_per_shard:
+            self.seal()
+        return ref
+
+    def checkpoint(self):
+        """Flush the current shard file and report rows not yet passed to on_rows."""
+        fh, ref = self._fh, self._ref
+        if fh is None or ref is None or self._reported == len(self._entries):
+            return
+        fh.flush()
+        first, self._reported = self._reported, len(self._entries)
+        if self.on_rows is not None:
+            self.on_rows(ref, first, self._entries[first:])
+
+    def seal(self):
+        fh, ref = self._fh, self._ref
+        if fh is None or ref is None:
+            return
+        self.checkpoint()
+        fh.close()
+        self._fh = None
+        entries = self._entries
+        index = {"model": self.model, "dim": self.dim, "rows": len(entries), "dtype": "<f4",
+                 "entries": [list(e) for e in entries]}
+        with open(local_path(ref, ".json"), "wb") as f:
+            f.write(orjson.dumps(index))
+        uploaded = False
+        if self.upload:
+            from ..storage.s3 import upload_file
+            uploaded = (upload_file(local_path(ref), s3_key(ref))
+                        and upload_file(local_path(ref, ".json"), s3_key(ref, ".json"), "application/json"))
+            if not uploaded:
+                logger.error("EMB shard %s: upload failed; kept local-only at %s", ref, local_path(ref))
+                self.upload_failed.append(ref)
+        logger.info("EMB shard sealed: %s (%d rows)", ref, len(entries))
+        self.sealed.append(ref)
+        if self.on_sealed is not None:
+            self.on_sealed(ref, uploaded)
+
+    def close(self):
+        self.seal()
+
+def read_index(ref: str) -> Optional[Dict]:
+    path = local_path(ref, ".json")
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
+    from ..storage.s3 import get_bytes
+    data = get_bytes(s3_key(ref, ".json"))
+    return orjson.loads(data) if data else None
+
+def open_shard(ref: str, dim: int, rows: Optional[int] = None, download: bool = True) -> Optional[np.memmap]:
+    """Memory-map a shard, downloading it to EMB_SHARD_DIR first if it is only in object storage."""
+    path = local_path(ref)
+    if not os.path.exists(path):
+        if not download:
+            return None
+        from ..storage.s3 import download_file
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if not download_file(s3_key(ref), path):
+            return None
+    size = os.path.getsize(path) // (_DTYPE.itemsize * dim)
+    return np.memmap(path, dtype=_DTYPE, mode="r", shape=(rows if rows is not None else size, dim))
+
+def shard_available(ref: str) -> bool:
+    """True if the shard can be read: on local disk, or uploaded to object storage."""
+    if os.path.exists(local_path(ref)):
+        return True
+    from ..storage.s3 import S3_BUCKET, exists
+    try:
+        return bool(S3_BUCKET) and exists(s3_key(ref))
+    except Exception as e:
+        logger.warning("EMB shard %s: availability check failed: %s", ref, e)
+        return False
+
+def _row_runs(rows: List[int]) -> List[Tuple[int, int]]:
+    """Sorted rows -> [start, end) runs, merging gaps below _RANGE_GAP_ROWS."""
+    runs: List[Tuple[int, int]] = []
+    for r in rows:
+        if runs and r - runs[-1][1] < _RANGE_GAP_ROWS:
+            runs[-1] = (runs[-1][0], r + 1)
+        else:
+            runs.append((r, r + 1))
+    return runs
+
+def read_rows(refs: Iterable[Optional[RowRef]], dim: int, download: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Vectors for (shard, row) refs, in order, as (X, ok): ok marks the rows actually
+    read; None refs and unreadable rows (missing shard, short file, failed range
+    read) are zero and not ok. Each shard is read once: memory-mapped when local (or
+    when `download` is set), otherwise with one ranged GET per cluster of nearby rows.
+    """
+    refs = list(refs)
+    out = np.zeros((len(refs), dim), dtype=np.float32)
+    ok = np.zeros(len(refs), dtype=bool)
+    by_shard: Dict[str, List[Tuple[int, int]]] = {}
+    for i, ref in enumerate(refs):
+        if ref is not None and ref[0]:
+            by_shard.setdefault(ref[0], []).append((int(ref[1]), i))
+    for shard, wanted in by_shard.items():
+        mm = open_shard(shard, dim, download=download)
+        if mm is not None:
+            rows = np.array([r for r, _ in wanted])
+            present = rows < mm.shape[0]
+            idx = np.array([i for _, i in wanted])[present]
+            out[idx] = mm[rows[present]]
+            ok[idx] = True
+            continue
+        from ..storage.s3 import get_range
+        row_bytes = dim * _DTYPE.itemsize
+        targets: Dict[int, List[int]] = {}
+        for r, i in wanted:
+            targets.setdefault(r, []).append(i)
+        for start, end in _row_runs(sorted(targets)):
+            data = get_range(s3_key(shard), start * row_bytes, end * row_bytes)
+            if not data:
+                continue
+            block = np.frombuffer(data, dtype=_DTYPE)
+            block = block[:block.shape[0] // dim * dim].reshape(-1, dim)
+            for r in range(start, min(end, start + block.shape[0])):
+                for i in targets.get(r, ()):
+                    out[i] = block[r - start]
+                    ok[i] = True
+    return out, ok
@@ -1,39 +1,97 @@
 # src/verticalizer/pipeline/common.py
 import logging
+import os
 import numpy as np
 import pandas as pd
-from typing import List
+from typing import Dict, List
 from ..apps.crawler.service import crawl_sites
 from ..apps.embedder.service import embed_sites
-from ..storage.repositories import latest_text_for_site_batch
-from ..embeddings.cache import get_cached
-from ..embeddings.gemini_client import GeminiEmbedder
+from ..embeddings.gemini_client import EMBED_DIM, GeminiEmbedder
+from ..embeddings.shards import read_rows, shard_available
+from ..storage.repositories import create_tables_if_missing, latest_embedding_refs, sites_crawled_within
 
 logger = logging.getLogger(__name__)
 
-def prepare_embeddings_for_df(df: pd.DataFrame, modelname: str = "models/text-embedding-004", store_to_s3: bool = False) -> np.ndarray:
-    # Ensure crawl and embeddings exist
-    sites: List[str] = (
-        df["website"].dropna().astype(str).str.strip().tolist()
-        if "website" in df.columns else []
-    )
-    sites = [s for s in sites if s]
+# Sites crawled more recently than this are not re-crawled when preparing embeddings.
+PREP_MAX_CRAWL_AGE_HOURS = float(os.getenv("PREP_MAX_CRAWL_AGE_HOURS", "168"))
 
-    if not sites:
-        return np.zeros((0, 768), dtype=np.float32)
+def _column(df: pd.DataFrame, name: str) -> List[str]:
+    if name not in df.columns:
+        return [""] * len(df)
+    return [str(v).strip() if isinstance(v, str) else "" for v in df[name].tolist()]
 
-    logger.info("COMMON: Crawling %d sites", len(sites))
-    crawl_sites(sites)
+def prepare_embeddings_for_df(df: pd.DataFrame, modelname: str = "models/text-embedding-004", store_to_s3: bool = False,
+                              max_crawl_age_hours: float = PREP_MAX_CRAWL_AGE_HOURS) -> np.ndarray:
+    """
+    One float32 row per row of `df`, in order, of the embedder's dim
+    (GEMINI_EMB_DIM). Rows with `contenttext` are embedded from that text in one
+    deduplicated batch, without crawling or touching the DB; other rows use their
+    website's latest crawl. Rows with neither stay zero. Stored embeddings of
+    another dim are re-embedded; a freshly embedded vector of another dim raises
+    ValueError (GEMINI_EMB_DIM does not match the model).
+    """
+    dim = EMBED_DIM
+    X = np.zeros((len(df), dim), dtype=np.float32)
+    if len(df) == 0:
+        return X
+    websites = _column(df, "website")
+    texts = _column(df, "contenttext")
 
-    embed_sites(sites, modelname=modelname, store_to_s3=store_to_s3)
+    def put(rows: List[List[int]], vecs: np.ndarray):
+        if len(vecs) and vecs.shape[1] != dim:
+            raise ValueError(f"prepare_embeddings_for_df: got {vecs.shape[1]}-dim vectors from {modelname}, "
+                             f"expected {dim} (GEMINI_EMB_DIM)")
+        for r, vec in zip(rows, vecs):
+            X[r] = vec
 
-    texts_map = latest_text_for_site_batch(sites)
-    embedder = GeminiEmbedder(model=modelname)
-    vectors = []
-    for site in sites:
-        text = texts_map.get(site) or ""
-        vec = get_cached(text.strip(), embedder.model) or embedder.embed_text(text)
-        vectors.append(vec)
+    inline = [i for i, t in enumerate(texts) if t]
+    if inline:
+        logger.info("COMMON: Embedding %d rows from inline contenttext", len(inline))
+        embedded = GeminiEmbedder(model=modelname, embeddim=dim).embed_texts_dedup([texts[i] for i in inline],
+                                                                                   show_progress=False)
+        put([[i] for i in inline], np.asarray(embedded, dtype=np.float32))
 
-    X = np.array(vectors, dtype=np.float32)
-    return X
\ No newline at end of file
+    positions: Dict[str, List[int]] = {}
+    for i, site in enumerate(websites):
+        if site and not texts[i]:
+            positions.setdefault(site, []).append(i)
+    if not positions:
+        return X
+
+    # Plan: each distinct site once. Crawl only sites without a crawl in the last
+    # max_crawl_age_hours; embed only sites whose stored embedding is missing, was
+    # computed from other text than their latest crawl or with another dim, or sits
+    # in an unreadable shard. Everything else is read back from the embedding shards.
+    uniq = list(positions)
+    create_tables_if_missing()
+
+    fresh = sites_crawled_within(uniq, max_crawl_age_hours * 3600.0) if max_crawl_age_hours > 0 else set()
+    to_crawl = [s for s in uniq if s not in fresh]
+    if to_crawl:
+        logger.info("COMMON: Crawling %d sites (%d crawled within %.0fh)", len(to_crawl), len(fresh),
+                    max_crawl_age_hours)
+        crawl_sites(to_crawl)
+
+    refs = latest_embedding_refs(uniq, modelname, current_only=True)
+    readable = {ref: shard_available(ref) for ref in {r[0] for r in refs.values()}}
+    stored = {s: r for s, r in refs.items() if readable[r[0]] and r[2] == dim}
+    mismatched = sum(1 for r in refs.values() if readable[r[0]] and r[2] != dim)
+    if mismatched:
+        logger.warning("COMMON: re-embedding %d sites whose stored vectors are not %d-dim", mismatched, dim)
+
+    reuse = list(stored)
+    vecs, ok = read_rows([stored[s][:2] for s in reuse], dim)
+    put([positions[s] for s, hit in zip(reuse, ok) if hit], vecs[ok])
+    unread = [s for s, hit in zip(reuse, ok) if not hit]
+    to_embed = [s for s in uniq if s not in stored] + unread
+    logger.info("COMMON: %d crawled rows, %d distinct sites: %d stored vectors reused, %d to embed",
+                sum(len(p) for p in positions.values()), len(uniq), len(stored) - len(unread), len(to_embed))
+
+    # Stream the rest chunkwise straight into the matrix.
+    if to_embed:
+        embed_sites(to_embed, modelname=modelname, store_to_s3=store_to_s3,
+                    sink=lambda site, vec: put([positions[site]], vec[None, :]))
+    return X
+
+# name used by the pipeline nodes and the infer service
+prepareembeddingsfordf = prepare_embeddings_for_df
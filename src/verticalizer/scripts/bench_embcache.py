@@ -0,0 +1,83 @@
+# src/verticalizer/scripts/bench_embcache.py
+"""
+Compare embedding-cache lookups: legacy one-JSON-file-per-vector vs the SQLite store.
+
+    python -m src.verticalizer.scripts.bench_embcache --entries 20000 --dim 768
+
+Builds a legacy JSON cache in a temporary directory, imports it with
+migrate_json_cache, then times random lookups against both layouts.
+"""
+import argparse
+import hashlib
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+import orjson
+
+
+def _legacy_get(cache_dir: str, text: str, model: str):
+    h = hashlib.sha256(((model or "") + "\n" + (text or "")).encode("utf-8")).hexdigest()
+    path = os.path.join(cache_dir, f"{h}.json")
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
+    return None
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--entries", type=int, default=20000)
+    ap.add_argument("--dim", type=int, default=768)
+    ap.add_argument("--lookups", type=int, default=20000)
+    ap.add_argument("--batch", type=int, default=1000, help="texts per get_cached_many call")
+    args = ap.parse_args()
+
+    model = "models/bench"
+    with tempfile.TemporaryDirectory(prefix="embcache-bench-") as td:
+        legacy = os.path.join(td, "legacy")
+        os.makedirs(legacy)
+        os.environ["EMB_CACHE_DIR"] = os.path.join(td, "sqlite")
+        from ..embeddings import cache  # reads EMB_CACHE_DIR above
+
+        rng = np.random.default_rng(0)
+        texts = [f"page text {i}" for i in range(args.entries)]
+        for t in texts:
+            h = hashlib.sha256((model + "\n" + t).encode("utf-8")).hexdigest()
+            with open(os.path.join(legacy, f"{h}.json"), "wb") as f:
+                f.write(orjson.dumps(rng.standard_normal(args.dim).tolist()))
+
+        t0 = time.perf_counter()
+        n = cache.migrate_json_cache(legacy)
+        migrate = time.perf_counter() - t0
+
+        # half hits, half misses
+        probe = [random.choice(texts) if i % 2 == 0 else f"missing {i}" for i in range(args.lookups)]
+
+        t0 = time.perf_counter()
+        legacy_hits = sum(_legacy_get(legacy, t, model) is not None for t in probe)
+        t_legacy = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        single_hits = sum(cache.get_cached(t, model) is not None for t in probe)
+        t_single = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        batch_hits = 0
+        for i in range(0, len(probe), args.batch):
+            batch_hits += sum(v is not None for v in cache.get_cached_many(probe[i:i + args.batch], model))
+        t_batch = time.perf_counter() - t0
+        stats = cache.cache_stats()
+
+    m = args.lookups
+    print(f"migrated {n} vectors in {migrate:.1f}s; store {stats['bytes'] / 1e6:.1f} MB")
+    print(f"legacy JSON files      : {m / t_legacy:,.0f} lookups/sec ({legacy_hits} hits)")
+    print(f"sqlite get_cached      : {m / t_single:,.0f} lookups/sec ({single_hits} hits)")
+    print(f"sqlite get_cached_many : {m / t_batch:,.0f} lookups/sec ({batch_hits} hits, "
+          f"{t_legacy / t_batch:.1f}x legacy)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# src/verticalizer/scripts/bench_extractors.py
+"""
+Compare the readability and fast text extractors over a corpus of saved HTML.
+
+    python -m src.verticalizer.scripts.bench_extractors --html-dir /data/html --limit 500
+
+Reports docs/sec per extractor and token overlap of the fast output against
+readability (Jaccard and recall of readability's tokens), both on the first
+--excerpt-chars characters, i.e. what the crawler stores.
+"""
+import argparse
+import glob
+import os
+import re
+import statistics
+import time
+
+from ..crawl.parse import extract_readable_text
+
+_TOKEN = re.compile(r"\w+", re.U)
+
+
+def _tokens(text: str) -> set:
+    return {t.lower() for t in _TOKEN.findall(text or "")}
+
+
+def _load(html_dir: str, limit: int):
+    paths = sorted(glob.glob(os.path.join(html_dir, "**", "*.htm*"), recursive=True))[:limit or None]
+    docs = []
+    for p in paths:
+        with open(p, "rb") as f:
+            docs.append(f.read().decode("utf-8", errors="replace"))
+    return docs
+
+
+def _run(docs, extractor: str, max_chars: int):
+    out = []
+    t0 = time.perf_counter()
+    for html in docs:
+        out.append(extract_readable_text(html, extractor=extractor, max_chars=max_chars))
+    return out, time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--html-dir", required=True)
+    ap.add_argument("--limit", type=int, default=0)
+    ap.add_argument("--excerpt-chars", type=int, default=4000)
+    args = ap.parse_args()
+
+    docs = _load(args.html_dir, args.limit)
+    if not docs:
+        raise SystemExit(f"No .html files under {args.html_dir}")
+    ref, t_ref = _run(docs, "readability", 200000)
+    fast, t_fast = _run(docs, "fast", args.excerpt_chars)
+
+    jaccard, recall = [], []
+    for a, b in zip(ref, fast):
+        ta, tb = _tokens(a[:args.excerpt_chars]), _tokens(b[:args.excerpt_chars])
+        if not ta and not tb:
+            continue
+        jaccard.append(len(ta & tb) / max(1, len(ta | tb)))
+        recall.append(len(ta & tb) / max(1, len(ta)))
+
+    n = len(docs)
+    print(f"docs: {n}")
+    print(f"readability: {n / t_ref:.1f} docs/sec")
+    print(f"fast       : {n / t_fast:.1f} docs/sec ({t_ref / max(t_fast, 1e-9):.1f}x)")
+    if jaccard:
+        print(f"token jaccard (median/mean): {statistics.median(jaccard):.3f} / {statistics.mean(jaccard):.3f}")
+        print(f"readability token recall (median/mean): {statistics.median(recall):.3f} / {statistics.mean(recall):.3f}")
+
+
+if __name__ == "__main__":
+    main()
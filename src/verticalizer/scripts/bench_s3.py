@@ -0,0 +1,112 @@
+# src/verticalizer/scripts/bench_s3.py
+"""
+Compare serial put_bytes with put_many against a local S3-compatible stand-in.
+
+    python -m src.verticalizer.scripts.bench_s3 --objects 500 --latency-ms 20
+
+The stand-in is an in-process path-style S3 endpoint (PUT/GET/HEAD object, in
+memory) that sleeps --latency-ms per request to mimic a remote store. Pass
+--endpoint to run against a real S3-compatible service (e.g. MinIO) instead; the
+bucket must exist and S3_ACCESS_KEY/S3_SECRET_KEY must be set.
+"""
+import argparse
+import http.server
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    objects = {}
+    latency = 0.0
+    lock = threading.Lock()
+
+    def _reply(self, code: int, body: bytes = b""):
+        self.send_response(code)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", '"0"')
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def do_PUT(self):
+        time.sleep(self.latency)
+        data = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        with self.lock:
+            self.objects[urlparse(self.path).path] = data
+        self._reply(200)
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        data = self.objects.get(urlparse(self.path).path)
+        if data is None:
+            self._reply(404, b"<Error><Code>NoSuchKey</Code></Error>")
+        else:
+            self._reply(200, data)
+
+    def do_HEAD(self):
+        time.sleep(self.latency)
+        self._reply(404 if urlparse(self.path).path not in self.objects else 200)
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--objects", type=int, default=500)
+    ap.add_argument("--size", type=int, default=3072, help="bytes per object (768 float32 = 3072)")
+    ap.add_argument("--latency-ms", type=float, default=20.0)
+    ap.add_argument("--endpoint", default=None, help="real S3-compatible endpoint instead of the stand-in")
+    ap.add_argument("--bucket", default="bench")
+    args = ap.parse_args()
+
+    srv = None
+    if args.endpoint:
+        os.environ["S3_ENDPOINT"] = args.endpoint
+    else:
+        _Handler.latency = args.latency_ms / 1000.0
+        srv = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        srv.daemon_threads = True
+        threading.Thread(target=srv.serve_forever, daemon=True).start()
+        os.environ["S3_ENDPOINT"] = f"http://127.0.0.1:{srv.server_port}"
+        os.environ.setdefault("S3_ACCESS_KEY", "bench")
+        os.environ.setdefault("S3_SECRET_KEY", "bench")
+    os.environ["S3_BUCKET"] = args.bucket
+    os.environ["S3_MANIFEST"] = ""
+    from ..storage import s3  # reads the S3_* settings above
+
+    payload = os.urandom(args.size)
+    items = [(f"bench/serial/{i}.bin", payload, "application/octet-stream") for i in range(args.objects)]
+    try:
+        t0 = time.perf_counter()
+        for key, data, ctype in items:
+            s3.put_bytes(key, data, ctype)
+        serial = time.perf_counter() - t0
+
+        items = [(f"bench/many/{i}.bin", payload, "application/octet-stream") for i in range(args.objects)]
+        t0 = time.perf_counter()
+        first = s3.put_many(items, skip_existing=True)
+        parallel = time.perf_counter() - t0
+
+        s3._known_keys().clear()  # force HEAD checks, as a fresh process without a manifest would
+        t0 = time.perf_counter()
+        again = s3.put_many(items, skip_existing=True)
+        rerun = time.perf_counter() - t0
+    finally:
+        if srv is not None:
+            srv.shutdown()
+
+    n = args.objects
+    print(f"serial put_bytes      : {n / serial:.1f} objects/sec")
+    print(f"put_many              : {n / parallel:.1f} objects/sec ({serial / parallel:.1f}x), "
+          f"{sum(v == 'put' for v in first.values())} put")
+    print(f"put_many re-run (HEAD): {n / rerun:.1f} objects/sec, "
+          f"{sum(v == 'skipped' for v in again.values())} skipped")
+
+
+if __name__ == "__main__":
+    main()
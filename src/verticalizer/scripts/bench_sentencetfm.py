@@ -0,0 +1,69 @@
+# src/verticalizer/scripts/bench_sentencetfm.py
+"""
+Throughput (docs/sec) of local sentence-transformers encoding configurations.
+
+    python -m src.verticalizer.scripts.bench_sentencetfm --docs 2000 --workers 4
+
+Compares one-text-per-call encoding (the old embed_text path), default encode,
+and SentenceTfmEmbedder with length-sorted batches, a multi-process pool and the
+int8 / ONNX backends. The embedding cache is bypassed so every run encodes.
+Backends whose optional dependencies are missing fall back to torch (logged).
+"""
+import argparse
+import logging
+import random
+import time
+
+
+def _docs(n: int, seed: int = 0):
+    """Synthetic page excerpts with a skewed length mix (short titles to long articles)."""
+    rng = random.Random(seed)
+    words = [f"word{i}" for i in range(5000)]
+    return [" ".join(rng.choice(words) for _ in range(int(rng.paretovariate(1.2) * 20))) for _ in range(n)]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--model", default=None, help="default: SENTENCE_TFM_MODEL")
+    ap.add_argument("--docs", type=int, default=2000)
+    ap.add_argument("--batch-size", type=int, default=64)
+    ap.add_argument("--workers", type=int, default=4, help="processes for the multi-process run (0 skips it)")
+    ap.add_argument("--backends", nargs="*", default=["torch", "torch-int8", "onnx", "onnx-int8"])
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    from ..embeddings import sentencetfm
+    from ..embeddings.sentencetfm import SentenceTfmEmbedder
+    if sentencetfm.SentenceTransformer is None:
+        raise SystemExit("sentence-transformers is not installed (poetry install -E st)")
+    model = args.model or sentencetfm.DEFAULT_MODEL
+    docs = _docs(args.docs)
+    results = []
+
+    def run(name, fn, n):
+        t0 = time.perf_counter()
+        fn()
+        dt = time.perf_counter() - t0
+        results.append((name, n / dt))
+        print(f"{name:<34}: {n / dt:8.1f} docs/sec")
+
+    base = SentenceTfmEmbedder(model, batch_size=args.batch_size, workers=0, backend="torch")
+    single = docs[:max(1, len(docs) // 10)]  # one-per-call is slow; time a slice
+    run("encode one text per call", lambda: [base.model.encode([d]) for d in single], n=len(single))
+    run("encode(list) defaults", lambda: base.model.encode(docs), n=len(docs))
+    for backend in args.backends:
+        emb = base if backend == "torch" else SentenceTfmEmbedder(model, batch_size=args.batch_size,
+                                                                  workers=0, backend=backend)
+        run(f"{backend}, sorted batches of {args.batch_size}", lambda emb=emb: emb._encode(docs),
+            n=len(docs))
+    if args.workers > 1:
+        pooled = SentenceTfmEmbedder(model, batch_size=args.batch_size, workers=args.workers, backend="torch")
+        pooled._encode(docs[:args.batch_size * 2])  # start the pool outside the timing
+        try:
+            run(f"torch, {args.workers} processes", lambda: pooled._encode(docs), n=len(docs))
+        finally:
+            pooled.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+-- Convert crawls into a table range-partitioned by month on fetchedat.
+-- Columns follow the schema created by storage/repositories.py. Rewrites the
+-- whole table: run in a maintenance window. New databases are created
+-- partitioned by create_tables_if_missing and do not need this.
+BEGIN;
+
+ALTER TABLE crawls RENAME TO crawls_unpartitioned;
+ALTER INDEX IF EXISTS crawls_site_fetchedat_idx RENAME TO crawls_unpartitioned_site_fetchedat_idx;
+
+CREATE TABLE crawls (
+  id BIGINT NOT NULL DEFAULT nextval('crawls_id_seq'),
+  site TEXT REFERENCES sites(site),
+  url TEXT,
+  fetchedat TIMESTAMP NOT NULL DEFAULT NOW(),
+  httpstatus INTEGER,
+  contenthash TEXT,
+  textexcerpt TEXT,
+  textfullref TEXT,
+  lang TEXT,
+  source TEXT,
+  crawlstatus TEXT,
+  PRIMARY KEY (id, fetchedat)
+) PARTITION BY RANGE (fetchedat);
+
+CREATE TABLE crawls_default PARTITION OF crawls DEFAULT;
+
+-- one partition per month from the oldest row through two months ahead
+DO $$
+DECLARE
+  m DATE;
+  last DATE;
+BEGIN
+  SELECT date_trunc('month', COALESCE(MIN(fetchedat), NOW()))::date INTO m FROM crawls_unpartitioned;
+  last := (date_trunc('month', NOW()) + INTERVAL '2 months')::date;
+  WHILE m <= last LOOP
+    EXECUTE format('CREATE TABLE IF NOT EXISTS %I PARTITION OF crawls FOR VALUES FROM (%L) TO (%L)',
+                   'crawls_y' || to_char(m, 'YYYY') || 'm' || to_char(m, 'MM'),
+                   m, (m + INTERVAL '1 month')::date);
+    m := (m + INTERVAL '1 month')::date;
+  END LOOP;
+END $$;
+
+INSERT INTO crawls(id, site, url, fetchedat, httpstatus, contenthash, textexcerpt,
+                   textfullref, lang, source, crawlstatus)
+SELECT id, site, url, COALESCE(fetchedat, NOW()), httpstatus, contenthash, textexcerpt,
+       textfullref, lang, source, crawlstatus
+FROM crawls_unpartitioned;
+
+ALTER SEQUENCE crawls_id_seq OWNED BY crawls.id;
+DROP TABLE crawls_unpartitioned;
+CREATE INDEX IF NOT EXISTS crawls_site_fetchedat_idx ON crawls(site, fetchedat DESC);
+
+COMMIT;
@@ -1,8 +1,15 @@
 # src/verticalizer/storage/repositories.py
-from typing import List, Optional, Dict
+import logging
+import re
+from datetime import date
+from typing import Callable, Iterator, List, Optional, Dict, Set, Tuple
 from sqlalchemy import text
 from .db import engine
 
+logger = logging.getLogger(__name__)
+
+CRAWL_PARTITIONS_AHEAD = 2  # monthly crawls partitions created ahead of the current month
+
 def create_tables_if_missing():
     with engine.begin() as conn:
         conn.execute(text("""
@@ -15,18 +22,64 @@ def create_tables_if_missing():
         )"""))
         conn.execute(text("""
         CREATE TABLE IF NOT EXISTS crawls (
-            id BIGSERIAL PRIMARY KEY,
+            id BIGSERIAL,
             site TEXT REFERENCES sites(site),
             url TEXT,
-            fetchedat TIMESTAMP DEFAULT NOW(),
+            fetchedat TIMESTAMP NOT NULL DEFAULT NOW(),
             httpstatus INTEGER,
             contenthash TEXT,
             textexcerpt TEXT,
             textfullref TEXT,
             lang TEXT,
             source TEXT,
+            crawlstatus TEXT,
+            PRIMARY KEY (id, fetchedat)
+        ) PARTITION BY RANGE (fetchedat)"""))
+        _ensure_crawl_partitions(conn)
+        conn.execute(text("""
+        CREATE INDEX IF NOT EXISTS crawls_site_fetchedat_idx ON crawls(site, fetchedat DESC)"""))
+        conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS latestcrawl (
+            site TEXT PRIMARY KEY REFERENCES sites(site),
+            url TEXT,
+            fetchedat TIMESTAMP,
+            contenthash TEXT,
+            textexcerpt TEXT,
             crawlstatus TEXT
         )"""))
+        # one-time backfill for databases that predate latestcrawl
+        conn.execute(text("""
+        INSERT INTO latestcrawl(site, url, fetchedat, contenthash, textexcerpt, crawlstatus)
+        SELECT DISTINCT ON (c.site) c.site, c.url, c.fetchedat, c.contenthash, c.textexcerpt, c.crawlstatus
+        FROM crawls c
+        WHERE c.site IS NOT NULL AND NOT EXISTS (SELECT 1 FROM latestcrawl)
+        ORDER BY c.site, c.fetchedat DESC
+        ON CONFLICT(site) DO NOTHING"""))
+        conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS crawlvalidators (
+            url TEXT PRIMARY KEY,
+            site TEXT REFERENCES sites(site),
+            etag TEXT,
+            lastmodified TEXT,
+            contenthash TEXT,
+            checkedat TIMESTAMP DEFAULT NOW()
+        )"""))
+        conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS crawlqueue (
+            id BIGSERIAL PRIMARY KEY,
+            site TEXT NOT NULL,
+            url TEXT NOT NULL UNIQUE,
+            source TEXT,
+            status TEXT NOT NULL DEFAULT 'PENDING',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            leaseowner TEXT,
+            leaseexpires TIMESTAMP,
+            lasterror TEXT,
+            enqueuedat TIMESTAMP DEFAULT NOW(),
+            updatedat TIMESTAMP DEFAULT NOW()
+        )"""))
+        conn.execute(text("""
+        CREATE INDEX IF NOT EXISTS crawlqueue_status_idx ON crawlqueue(status, id)"""))
         conn.execute(text("""
         CREATE TABLE IF NOT EXISTS embeddings (
             id BIGSERIAL PRIMARY KEY,
@@ -38,6 +91,13 @@ def create_tables_if_missing():
             vectorref TEXT,
             vectorlen INTEGER
         )"""))
+        conn.execute(text("ALTER TABLE embeddings ADD COLUMN IF NOT EXISTS shardref TEXT"))
+        conn.execute(text("ALTER TABLE embeddings ADD COLUMN IF NOT EXISTS shardrow INTEGER"))
+        conn.execute(text("""
+        CREATE INDEX IF NOT EXISTS embeddings_site_model_idx ON embeddings(site, modelname)"""))
+        conn.execute(text("""
+        CREATE INDEX IF NOT EXISTS embeddings_shardref_idx ON embeddings(shardref)"""))
+        _create_embcache_table(conn)
         conn.execute(text("""
         CREATE TABLE IF NOT EXISTS models (
             id BIGSERIAL PRIMARY KEY,
@@ -65,6 +125,140 @@ def create_tables_if_missing():
             metricsjson TEXT
         )"""))
 
+# ---------------- crawls partitions ----------------
+# crawls is range-partitioned by month on fetchedat (crawls_yYYYYmMM) plus a
+# crawls_default catch-all. Databases created before partitioning are converted
+# by migrations/002_partition_crawls.sql.
+
+_PARTITION_NAME = re.compile(r"^crawls_y(\d{4})m(\d{2})$")
+
+def _month_add(d: date, months: int) -> date:
+    m = d.year * 12 + d.month - 1 + months
+    return date(m // 12, m % 12 + 1, 1)
+
+def crawl_partition_name(month: date) -> str:
+    return f"crawls_y{month.year:04d}m{month.month:02d}"
+
+def _crawls_partitioned(conn) -> bool:
+    kind = conn.execute(text("SELECT relkind FROM pg_class WHERE oid = to_regclass('crawls')")).scalar()
+    return kind == "p"
+
+# pg_advisory_xact_lock key serializing partition creation across processes
+_PARTITION_LOCK_KEY = 0x63726177  # "craw"
+
+def _default_has_rows(conn, lo: date, hi: date) -> bool:
+    return bool(conn.execute(text("""SELECT EXISTS (SELECT 1 FROM crawls_default
+                                     WHERE fetchedat >= :lo AND fetchedat < :hi)"""),
+                             {"lo": lo, "hi": hi}).scalar())
+
+def _move_default_rows(conn, name: str, lo: date, hi: date):
+    """
+    Create a monthly partition whose rows already sit in crawls_default: detach the
+    default, create the partition, move the rows, re-attach. Takes heavy locks on
+    crawls, so it only runs from ensure_crawl_partitions (maintenance), not on start-up.
+    """
+    conn.execute(text("ALTER TABLE crawls DETACH PARTITION crawls_default"))
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF crawls "
+                      f"FOR VALUES FROM ('{lo.isoformat()}') TO ('{hi.isoformat()}')"))
+    moved = conn.execute(text(f"""
+        WITH moved AS (DELETE FROM crawls_default WHERE fetchedat >= :lo AND fetchedat < :hi RETURNING *)
+        INSERT INTO {name} SELECT * FROM moved"""), {"lo": lo, "hi": hi}).rowcount
+    conn.execute(text("ALTER TABLE crawls ATTACH PARTITION crawls_default DEFAULT"))
+    logger.info("crawls: moved %d rows from crawls_default into %s", moved, name)
+
+def _ensure_crawl_partitions(conn, ahead: int = CRAWL_PARTITIONS_AHEAD, move_default: bool = False):
+    """
+    Create missing monthly partitions, serialized across processes with a
+    transaction-scoped advisory lock. A month whose rows already landed in
+    crawls_default is skipped with a warning unless `move_default` is set.
+    """
+    if not _crawls_partitioned(conn):
+        logger.warning("crawls is not partitioned; run storage/migrations/002_partition_crawls.sql")
+        return
+    conn.execute(text("SELECT pg_advisory_xact_lock(:k)"), {"k": _PARTITION_LOCK_KEY})
+    conn.execute(text("CREATE TABLE IF NOT EXISTS crawls_default PARTITION OF crawls DEFAULT"))
+    current = conn.execute(text("SELECT date_trunc('month', NOW())::date")).scalar()
+    for i in range(ahead + 1):
+        lo = _month_add(current, i)
+        hi = _month_add(lo, 1)
+        name = crawl_partition_name(lo)
+        if conn.execute(text("SELECT to_regclass(:n)"), {"n": name}).scalar() is not None:
+            continue
+        if _default_has_rows(conn, lo, hi):
+            if move_default:
+                _move_default_rows(conn, name, lo, hi)
+            else:
+                logger.warning("crawls: %s has rows in crawls_default; run `verticalizer maintenance "
+                               "partitions` to create it", name)
+            continue
+        conn.execute(text(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF crawls "
+                          f"FOR VALUES FROM ('{lo.isoformat()}') TO ('{hi.isoformat()}')"))
+
+def ensure_crawl_partitions(ahead: int = CRAWL_PARTITIONS_AHEAD):
+    """
+    Create monthly crawls partitions for the current month and `ahead` months after
+    it, moving rows that already landed in crawls_default into their partition.
+    """
+    with engine.begin() as conn:
+        _ensure_crawl_partitions(conn, ahead, move_default=True)
+
+def list_crawl_partitions() -> List[Tuple[str, date, date]]:
+    """Monthly crawls partitions as (name, first day, first day of next month), oldest first."""
+    with engine.connect() as conn:
+        names = conn.execute(text("""
+            SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass('crawls')""")).scalars().all()
+    out = []
+    for name in names:
+        m = _PARTITION_NAME.match(name)
+        if m:
+            lo = date(int(m.group(1)), int(m.group(2)), 1)
+            out.append((name, lo, _month_add(lo, 1)))
+    return sorted(out, key=lambda p: p[1])
+
+def compact_crawl_partition(name: str, keep: int, batch: int = 10000,
+                            on_deleted: Optional[Callable[[List[Dict]], None]] = None) -> int:
+    """
+    Delete rows of one monthly partition that are neither among the `keep` newest
+    crawls of their site nor the source of a stored embedding (embeddings.shatext is
+    the sha256 of the excerpt). Works in batches of `batch` rows, one transaction
+    each; `on_deleted(rows)` runs inside the transaction (e.g. to archive them), so
+    a failure there keeps the batch. Returns the number of rows deleted.
+    """
+    if not _PARTITION_NAME.match(name):
+        raise ValueError(f"Not a monthly crawls partition: {name}")
+    q = text(f"""
+        WITH victims AS (
+            SELECT c.id, c.fetchedat FROM {name} c
+            WHERE EXISTS (SELECT 1 FROM crawls n
+                          WHERE n.site = c.site AND n.fetchedat > c.fetchedat
+                          OFFSET :skip LIMIT 1)
+              AND NOT EXISTS (SELECT 1 FROM embeddings e
+                              WHERE e.site = c.site
+                                AND e.shatext = encode(sha256(convert_to(COALESCE(c.textexcerpt, ''), 'UTF8')), 'hex'))
+            LIMIT :batch)
+        DELETE FROM {name} c USING victims v
+        WHERE c.id = v.id AND c.fetchedat = v.fetchedat
+        RETURNING c.*""")
+    total = 0
+    while True:
+        with engine.begin() as conn:
+            rows = [dict(r._mapping) for r in conn.execute(q, {"skip": max(0, keep - 1), "batch": batch})]
+            if rows and on_deleted is not None:
+                on_deleted(rows)
+        total += len(rows)
+        if len(rows) < batch:
+            return total
+
+def drop_crawl_partition_if_empty(name: str) -> bool:
+    if not _PARTITION_NAME.match(name):
+        raise ValueError(f"Not a monthly crawls partition: {name}")
+    with engine.begin() as conn:
+        if conn.execute(text(f"SELECT EXISTS (SELECT 1 FROM {name})")).scalar():
+            return False
+        conn.execute(text(f"DROP TABLE {name}"))
+    return True
+
 def upsert_site(site: str, contenthash: Optional[str] = None):
     with engine.begin() as conn:
         conn.execute(
@@ -88,23 +282,277 @@ def record_crawl(site: str, url: str, httpstatus: int, contenthash: str,
             {"site": site, "url": url, "st": httpstatus, "h": contenthash, "ex": textexcerpt,
              "ref": textfullref, "lang": lang, "src": source, "cst": status},
         )
+        conn.execute(
+            text("""INSERT INTO latestcrawl(site, url, fetchedat, contenthash, textexcerpt, crawlstatus)
+                    VALUES (:site, :url, NOW(), :h, :ex, :cst)
+                    ON CONFLICT(site) DO UPDATE SET url=EXCLUDED.url, fetchedat=EXCLUDED.fetchedat,
+                        contenthash=EXCLUDED.contenthash, textexcerpt=EXCLUDED.textexcerpt,
+                        crawlstatus=EXCLUDED.crawlstatus"""),
+            {"site": site, "url": url, "h": contenthash, "ex": textexcerpt, "cst": status},
+        )
+
+def get_validators(url: str) -> Optional[Dict[str, Optional[str]]]:
+    with engine.connect() as conn:
+        row = conn.execute(
+            text("SELECT etag, lastmodified, contenthash FROM crawlvalidators WHERE url=:url"),
+            {"url": url},
+        ).first()
+    if row is None:
+        return None
+    return {"etag": row[0], "lastmodified": row[1], "contenthash": row[2]}
+
+def get_validators_many(urls: List[str], chunk: int = 10000) -> Dict[str, Dict[str, Optional[str]]]:
+    """get_validators for many URLs in chunked `url = ANY(...)` queries; URLs without validators are absent."""
+    out: Dict[str, Dict[str, Optional[str]]] = {}
+    uniq = list(dict.fromkeys(urls))
+    with engine.connect() as conn:
+        for i in range(0, len(uniq), max(1, chunk)):
+            rows = conn.execute(
+                text("SELECT url, etag, lastmodified, contenthash FROM crawlvalidators WHERE url = ANY(:urls)"),
+                {"urls": uniq[i:i + chunk]},
+            ).all()
+            for r in rows:
+                out[r[0]] = {"etag": r[1], "lastmodified": r[2], "contenthash": r[3]}
+    return out
+
+def save_validators(url: str, site: str, etag: Optional[str], lastmodified: Optional[str], contenthash: str):
+    with engine.begin() as conn:
+        conn.execute(
+            text("""INSERT INTO crawlvalidators(url, site, etag, lastmodified, contenthash, checkedat)
+                    VALUES (:url, :site, :etag, :lm, :h, NOW())
+                    ON CONFLICT(url) DO UPDATE SET site=EXCLUDED.site, etag=EXCLUDED.etag,
+                        lastmodified=EXCLUDED.lastmodified, contenthash=EXCLUDED.contenthash,
+                        checkedat=EXCLUDED.checkedat"""),
+            {"url": url, "site": site, "etag": etag, "lm": lastmodified, "h": contenthash},
+        )
 
-def latest_text_for_site_batch(sites: List[str]) -> Dict[str, Optional[str]]:
+def write_crawl_batch(sites: List[str], crawls: List[Dict], validators: List[Dict],
+                      unchanged: List[Tuple[str, str]]):
+    """
+    Set-based write of a buffered crawl batch in one transaction (see storage/writer.py):
+    - sites: inserted if missing (one INSERT ... SELECT unnest ... ON CONFLICT DO NOTHING)
+    - crawls: rows with the record_crawl keys (site, url, httpstatus, contenthash,
+      textexcerpt, textfullref, lang, source, status), one multi-row INSERT; the
+      sites' lastcrawledat/lasthash and the latestcrawl row follow the last row per site
+    - validators: url, site, etag, lastmodified, contenthash; upserted, last per url wins
+    - unchanged: (site, url) pairs whose timestamps are only bumped
+    Every statement binds whole columns as arrays, so a batch costs a fixed number of
+    round trips however many rows it has.
+    """
+    if not (sites or crawls or validators or unchanged):
+        return
+    latest = {r["site"]: r for r in crawls}
+    vals = list({v["url"]: v for v in validators}.values())
+    with engine.begin() as conn:
+        all_sites = sorted(set(sites) | set(latest) | {v["site"] for v in vals} | {s for s, _ in unchanged})
+        conn.execute(
+            text("""INSERT INTO sites(site, firstseen)
+                    SELECT s, NOW() FROM unnest(CAST(:sites AS TEXT[])) AS s
+                    ON CONFLICT(site) DO NOTHING"""),
+            {"sites": all_sites},
+        )
+        if crawls:
+            conn.execute(
+                text("""INSERT INTO crawls(site, url, httpstatus, contenthash, textexcerpt,
+                                           textfullref, lang, source, crawlstatus)
+                        SELECT * FROM unnest(CAST(:site AS TEXT[]), CAST(:url AS TEXT[]),
+                                             CAST(:st AS INTEGER[]), CAST(:h AS TEXT[]),
+                                             CAST(:ex AS TEXT[]), CAST(:ref AS TEXT[]),
+                                             CAST(:lang AS TEXT[]), CAST(:src AS TEXT[]),
+                                             CAST(:cst AS TEXT[]))"""),
+                {"site": [r["site"] for r in crawls], "url": [r["url"] for r in crawls],
+                 "st": [int(r["httpstatus"] or 0) for r in crawls], "h": [r["contenthash"] for r in crawls],
+                 "ex": [r["textexcerpt"] for r in crawls], "ref": [r["textfullref"] for r in crawls],
+                 "lang": [r["lang"] for r in crawls], "src": [r["source"] for r in crawls],
+                 "cst": [r["status"] for r in crawls]},
+            )
+            conn.execute(
+                text("""UPDATE sites SET lastcrawledat=NOW(), lasthash=v.h
+                        FROM unnest(CAST(:sites AS TEXT[]), CAST(:hashes AS TEXT[])) AS v(site, h)
+                        WHERE sites.site = v.site"""),
+                {"sites": list(latest), "hashes": [r["contenthash"] for r in latest.values()]},
+            )
+            rows = list(latest.values())
+            conn.execute(
+                text("""INSERT INTO latestcrawl(site, url, fetchedat, contenthash, textexcerpt, crawlstatus)
+                        SELECT s, u, NOW(), h, ex, cst
+                        FROM unnest(CAST(:site AS TEXT[]), CAST(:url AS TEXT[]), CAST(:h AS TEXT[]),
+                                    CAST(:ex AS TEXT[]), CAST(:cst AS TEXT[])) AS v(s, u, h, ex, cst)
+                        ON CONFLICT(site) DO UPDATE SET url=EXCLUDED.url, fetchedat=EXCLUDED.fetchedat,
+                            contenthash=EXCLUDED.contenthash, textexcerpt=EXCLUDED.textexcerpt,
+                            crawlstatus=EXCLUDED.crawlstatus"""),
+                {"site": [r["site"] for r in rows], "url": [r["url"] for r in rows],
+                 "h": [r["contenthash"] for r in rows], "ex": [r["textexcerpt"] for r in rows],
+                 "cst": [r["status"] for r in rows]},
+            )
+        if vals:
+            conn.execute(
+                text("""INSERT INTO crawlvalidators(url, site, etag, lastmodified, contenthash, checkedat)
+                        SELECT u, s, e, lm, h, NOW()
+                        FROM unnest(CAST(:url AS TEXT[]), CAST(:site AS TEXT[]), CAST(:etag AS TEXT[]),
+                                    CAST(:lm AS TEXT[]), CAST(:h AS TEXT[])) AS v(u, s, e, lm, h)
+                        ON CONFLICT(url) DO UPDATE SET site=EXCLUDED.site, etag=EXCLUDED.etag,
+                            lastmodified=EXCLUDED.lastmodified, contenthash=EXCLUDED.contenthash,
+                            checkedat=EXCLUDED.checkedat"""),
+                {"url": [v["url"] for v in vals], "site": [v["site"] for v in vals],
+                 "etag": [v["etag"] for v in vals], "lm": [v["lastmodified"] for v in vals],
+                 "h": [v["contenthash"] for v in vals]},
+            )
+        if unchanged:
+            conn.execute(text("UPDATE sites SET lastcrawledat=NOW() WHERE site = ANY(:sites)"),
+                         {"sites": sorted({s for s, _ in unchanged})})
+            conn.execute(text("UPDATE crawlvalidators SET checkedat=NOW() WHERE url = ANY(:urls)"),
+                         {"urls": [u for _, u in unchanged]})
+
+def mark_unchanged(site: str, url: str):
+    """Cheap re-crawl marker: bump freshness timestamps without a new crawls row."""
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE sites SET lastcrawledat=NOW() WHERE site=:site"), {"site": site})
+        conn.execute(text("UPDATE crawlvalidators SET checkedat=NOW() WHERE url=:url"), {"url": url})
+
+def sites_crawled_within(sites: List[str], max_age_seconds: float) -> Set[str]:
+    if not sites:
+        return set()
+    with engine.connect() as conn:
+        rows = conn.execute(
+            text("""SELECT site FROM sites
+                    WHERE site = ANY(:sites)
+                      AND lastcrawledat >= NOW() - make_interval(secs => :age)"""),
+            {"sites": list(sites), "age": float(max_age_seconds)},
+        ).all()
+    return {r[0] for r in rows}
+
+# ---------------- crawl frontier (crawlqueue) ----------------
+# status: PENDING -> LEASED -> DONE, or back to PENDING on failure until
+# max_attempts is reached (FAILED). An expired lease is leasable again, so a
+# worker that dies mid-batch only delays its jobs.
+
+def enqueue_crawl_jobs(jobs: List[Tuple[str, str]], source: str = "queue") -> int:
+    """
+    Add (site, url) jobs to the frontier. URLs already queued are left alone while
+    pending or leased, and reset to PENDING (attempts 0) if DONE or FAILED, so a
+    re-run of the same input re-crawls it. Returns the number of rows inserted or reset.
+    """
+    if not jobs:
+        return 0
+    with engine.begin() as conn:
+        res = conn.execute(
+            text("""INSERT INTO crawlqueue(site, url, source)
+                    VALUES (:site, :url, :src)
+                    ON CONFLICT(url) DO UPDATE SET site=EXCLUDED.site, source=EXCLUDED.source,
+                        status='PENDING', attempts=0, leaseowner=NULL, leaseexpires=NULL,
+                        lasterror=NULL, updatedat=NOW()
+                    WHERE crawlqueue.status IN ('DONE', 'FAILED')"""),
+            [{"site": site, "url": url, "src": source} for site, url in jobs],
+        )
+    return max(0, res.rowcount or 0)
+
+def lease_crawl_jobs(owner: str, limit: int, lease_seconds: float,
+                     max_attempts: int = 3) -> List[Tuple[int, str, str, str]]:
+    """
+    Lease up to `limit` pending (or lease-expired) jobs for `owner`. Rows are claimed
+    with FOR UPDATE SKIP LOCKED, so concurrent workers never get the same job.
+    Expired leases that have used up max_attempts are marked FAILED first.
+    Returns (id, site, url, source) tuples.
+    """
+    with engine.begin() as conn:
+        conn.execute(
+            text("""UPDATE crawlqueue SET status='FAILED', leaseowner=NULL, updatedat=NOW(),
+                        lasterror=COALESCE(lasterror, 'lease expired')
+                    WHERE status='LEASED' AND leaseexpires < NOW() AND attempts >= :maxa"""),
+            {"maxa": int(max_attempts)},
+        )
+        rows = conn.execute(
+            text("""UPDATE crawlqueue q
+                    SET status='LEASED', leaseowner=:owner, attempts=q.attempts + 1,
+                        leaseexpires=NOW() + make_interval(secs => :lease), updatedat=NOW()
+                    WHERE q.id IN (
+                        SELECT id FROM crawlqueue
+                        WHERE (status='PENDING' OR (status='LEASED' AND leaseexpires < NOW()))
+                          AND attempts < :maxa
+                        ORDER BY id
+                        LIMIT :lim
+                        FOR UPDATE SKIP LOCKED)
+                    RETURNING q.id, q.site, q.url, q.source"""),
+            {"owner": owner, "lease": float(lease_seconds), "maxa": int(max_attempts), "lim": int(limit)},
+        ).all()
+    return [(r[0], r[1], r[2], r[3]) for r in rows]
+
+def complete_crawl_jobs(ids: List[int], owner: str):
+    """Mark leased jobs DONE; ignores jobs whose lease has moved to another worker."""
+    if not ids:
+        return
+    with engine.begin() as conn:
+        conn.execute(
+            text("""UPDATE crawlqueue SET status='DONE', leaseowner=NULL, leaseexpires=NULL, updatedat=NOW()
+                    WHERE id = ANY(:ids) AND leaseowner=:owner"""),
+            {"ids": list(ids), "owner": owner},
+        )
+
+def fail_crawl_jobs(ids: List[int], owner: str, error: str, max_attempts: int = 3):
+    """Release failed jobs for retry, or mark them FAILED once max_attempts is used up."""
+    if not ids:
+        return
+    with engine.begin() as conn:
+        conn.execute(
+            text("""UPDATE crawlqueue
+                    SET status=CASE WHEN attempts >= :maxa THEN 'FAILED' ELSE 'PENDING' END,
+                        leaseowner=NULL, leaseexpires=NULL, lasterror=:err, updatedat=NOW()
+                    WHERE id = ANY(:ids) AND leaseowner=:owner"""),
+            {"ids": list(ids), "owner": owner, "err": (error or "")[:1000], "maxa": int(max_attempts)},
+        )
+
+def crawl_queue_counts() -> Dict[str, int]:
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT status, COUNT(*) FROM crawlqueue GROUP BY status")).all()
+    return {r[0]: int(r[1]) for r in rows}
+
+LATEST_CHUNK = 10000  # sites per lookup query
+
+def latest_text_for_site_batch(sites: List[str], chunk: int = LATEST_CHUNK) -> Dict[str, Optional[str]]:
+    """Latest crawl excerpt per site from latestcrawl, queried in chunks of `chunk` sites."""
     out: Dict[str, Optional[str]] = {s: None for s in sites}
     if not sites:
         return out
+    uniq = list(out)
     with engine.connect() as conn:
-        q = text("""
-            SELECT DISTINCT ON (c.site) c.site, c.textexcerpt
-            FROM crawls c
-            WHERE c.site = ANY(:sites)
-            ORDER BY c.site, c.fetchedat DESC
-        """)
-        rows = conn.execute(q, {"sites": sites}).all()
-        for site, textexcerpt in rows:
-            out[site] = textexcerpt
+        q = text("SELECT site, textexcerpt FROM latestcrawl WHERE site = ANY(:sites)")
+        for i in range(0, len(uniq), max(1, chunk)):
+            for site, textexcerpt in conn.execute(q, {"sites": uniq[i:i + chunk]}):
+                out[site] = textexcerpt
     return out
 
+STREAM_FETCH_SIZE = 2000  # rows per server-side cursor fetch
+
+def iter_latest_texts(sites: Optional[List[str]] = None, fetch_size: int = STREAM_FETCH_SIZE,
+                      chunk: int = LATEST_CHUNK) -> Iterator[Tuple[str, Optional[str], Optional[str]]]:
+    """
+    Stream (site, textexcerpt, contenthash) from latestcrawl through a server-side
+    cursor, fetch_size rows at a time, so memory does not grow with the number of
+    sites. With `sites`, each distinct requested site is yielded exactly once (text
+    and hash None when never crawled), looked up `chunk` sites per query; without
+    it, every site in latestcrawl is streamed in site order.
+    """
+    with engine.connect() as conn:
+        conn = conn.execution_options(stream_results=True, yield_per=max(1, fetch_size))
+        if sites is None:
+            yield from (
+                (r[0], r[1], r[2]) for r in
+                conn.execute(text("SELECT site, textexcerpt, contenthash FROM latestcrawl ORDER BY site"))
+            )
+            return
+        q = text("SELECT site, textexcerpt, contenthash FROM latestcrawl WHERE site = ANY(:sites)")
+        uniq = list(dict.fromkeys(sites))
+        for i in range(0, len(uniq), max(1, chunk)):
+            part = uniq[i:i + chunk]
+            found = set()
+            for r in conn.execute(q, {"sites": part}):
+                found.add(r[0])
+                yield r[0], r[1], r[2]
+            for site in part:
+                if site not in found:
+                    yield site, None, None
+
 def record_embedding(site: str, modelname: str, dim: int, shatext: str, vectorref: str, vectorlen: int):
     with engine.begin() as conn:
         conn.execute(
@@ -114,6 +562,97 @@ def record_embedding(site: str, modelname: str, dim: int, shatext: str, vectorre
              "vectorref": vectorref, "vectorlen": vectorlen},
         )
 
+def record_embeddings(rows: List[Dict]):
+    """
+    Batched record_embedding for shard-backed vectors; rows carry site, modelname,
+    dim, shatext, shardref, shardrow (vectorref/vectorlen optional).
+    """
+    if not rows:
+        return
+    with engine.begin() as conn:
+        conn.execute(
+            text("""INSERT INTO embeddings(site, modelname, dim, shatext, vectorref, vectorlen, shardref, shardrow)
+                    SELECT * FROM unnest(CAST(:site AS TEXT[]), CAST(:model AS TEXT[]), CAST(:dim AS INTEGER[]),
+                                         CAST(:sha AS TEXT[]), CAST(:ref AS TEXT[]), CAST(:len AS INTEGER[]),
+                                         CAST(:shard AS TEXT[]), CAST(:row AS INTEGER[]))"""),
+            {"site": [r["site"] for r in rows], "model": [r["modelname"] for r in rows],
+             "dim": [int(r["dim"]) for r in rows], "sha": [r["shatext"] for r in rows],
+             "ref": [r.get("vectorref") or "" for r in rows],
+             "len": [int(r.get("vectorlen") or r["dim"]) for r in rows],
+             "shard": [r["shardref"] for r in rows], "row": [int(r["shardrow"]) for r in rows]},
+        )
+
+def set_shard_vectorref(shardref: str, vectorref: str):
+    """Point every row of a shard at its object-storage key once the shard is uploaded."""
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE embeddings SET vectorref = :ref WHERE shardref = :shard"),
+                     {"ref": vectorref, "shard": shardref})
+
+def latest_embedding_refs(sites: List[str], modelname: str, current_only: bool = False,
+                          chunk: int = LATEST_CHUNK) -> Dict[str, Tuple[str, int, int, str]]:
+    """
+    Newest shard-backed embedding per site as {site: (shardref, shardrow, dim, shatext)}.
+    With `current_only`, sites whose newest embedding was computed from a different
+    text than their latestcrawl excerpt (or that have no latestcrawl row) are left out.
+    """
+    out: Dict[str, Tuple[str, int, int, str]] = {}
+    uniq = list(dict.fromkeys(sites))
+    current = """, e.shatext = encode(sha256(convert_to(COALESCE(lc.textexcerpt, ''), 'UTF8')), 'hex')
+                 FROM embeddings e JOIN latestcrawl lc ON lc.site = e.site""" if current_only else """, TRUE
+                 FROM embeddings e"""
+    q = text(f"""SELECT DISTINCT ON (e.site) e.site, e.shardref, e.shardrow, e.dim, e.shatext{current}
+                 WHERE e.site = ANY(:sites) AND e.modelname = :model AND e.shardref IS NOT NULL
+                 ORDER BY e.site, e.createdat DESC, e.id DESC""")
+    with engine.connect() as conn:
+        for i in range(0, len(uniq), max(1, chunk)):
+            for r in conn.execute(q, {"sites": uniq[i:i + chunk], "model": modelname}):
+                if r[5]:
+                    out[r[0]] = (r[1], int(r[2]), int(r[3]), r[4])
+    return out
+
+def _create_embcache_table(conn):
+    conn.execute(text("""
+    CREATE TABLE IF NOT EXISTS embcache (
+        modelname TEXT NOT NULL,
+        tasktype TEXT NOT NULL,
+        dim INTEGER NOT NULL,
+        texthash BYTEA NOT NULL,
+        vec BYTEA NOT NULL,
+        createdat TIMESTAMP DEFAULT NOW(),
+        PRIMARY KEY (modelname, tasktype, dim, texthash)
+    )"""))
+
+def create_embcache_table_if_missing():
+    with engine.begin() as conn:
+        _create_embcache_table(conn)
+
+def embcache_get_many(modelname: str, tasktype: str, dim: int, hashes: List[bytes]) -> Dict[bytes, bytes]:
+    """Shared embedding cache lookup: {texthash: float32 bytes} for the hashes present."""
+    if not hashes:
+        return {}
+    with engine.connect() as conn:
+        rows = conn.execute(
+            text("""SELECT texthash, vec FROM embcache
+                    WHERE modelname = :model AND tasktype = :task AND dim = :dim
+                      AND texthash = ANY(CAST(:hashes AS BYTEA[]))"""),
+            {"model": modelname, "task": tasktype, "dim": int(dim), "hashes": list(hashes)},
+        ).fetchall()
+    return {bytes(r[0]): bytes(r[1]) for r in rows}
+
+def embcache_put_many(modelname: str, tasktype: str, dim: int, items: List[Tuple[bytes, bytes]]):
+    """Insert (texthash, float32 bytes) pairs; existing entries are kept."""
+    if not items:
+        return
+    with engine.begin() as conn:
+        conn.execute(
+            text("""INSERT INTO embcache(modelname, tasktype, dim, texthash, vec)
+                    SELECT :model, :task, :dim, h, v
+                    FROM unnest(CAST(:hashes AS BYTEA[]), CAST(:vecs AS BYTEA[])) AS t(h, v)
+                    ON CONFLICT DO NOTHING"""),
+            {"model": modelname, "task": tasktype, "dim": int(dim),
+             "hashes": [h for h, _ in items], "vecs": [v for _, v in items]},
+        )
+
 def save_model_version(geo: str, version: str, pathmodel: str, pathcalib: str, configjson: dict):
     import json as _json
     with engine.begin() as conn:
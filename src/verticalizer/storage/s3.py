@@ -1,9 +1,12 @@
 # src/verticalizer/storage/s3.py
 import os
 import logging
-from typing import Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 import boto3
 from botocore.client import Config
+from botocore.exceptions import ClientError
 
 logger = logging.getLogger(__name__)
 
@@ -12,16 +15,68 @@ S3_BUCKET = os.getenv("S3_BUCKET", "")
 S3_ACCESS_KEY = os.getenv("S3_ACCESS_KEY", "")
 S3_SECRET_KEY = os.getenv("S3_SECRET_KEY", "")
 S3_REGION = os.getenv("S3_REGION", "us-east-1")
+S3_MAX_CONCURRENCY = int(os.getenv("S3_MAX_CONCURRENCY", "16"))  # put_many/get_many workers and pool size
+S3_MAX_ATTEMPTS = int(os.getenv("S3_MAX_ATTEMPTS", "5"))  # per request, exponential backoff with jitter
+S3_MANIFEST = os.getenv("S3_MANIFEST", "")  # optional file of keys known to exist, one per line
+
+_client_lock = threading.Lock()
+_cached_client = None
+_known_lock = threading.Lock()
+_known: Optional[Set[str]] = None
 
 def _client():
-    return boto3.client(
-        "s3",
-        endpoint_url=S3_ENDPOINT or None,
-        aws_access_key_id=S3_ACCESS_KEY or None,
-        aws_secret_access_key=S3_SECRET_KEY or None,
-        region_name=S3_REGION,
-        config=Config(s3={"addressing_style": "path"})
-    )
+    """One client per process: boto3 clients are thread-safe and keep their own connection pool."""
+    global _cached_client
+    if _cached_client is None:
+        with _client_lock:
+            if _cached_client is None:
+                _cached_client = boto3.client(
+                    "s3",
+                    endpoint_url=S3_ENDPOINT or None,
+                    aws_access_key_id=S3_ACCESS_KEY or None,
+                    aws_secret_access_key=S3_SECRET_KEY or None,
+                    region_name=S3_REGION,
+                    config=Config(
+                        s3={"addressing_style": "path"},
+                        max_pool_connections=max(10, S3_MAX_CONCURRENCY),
+                        retries={"max_attempts": S3_MAX_ATTEMPTS, "mode": "standard"},
+                    ),
+                )
+    return _cached_client
+
+def _known_keys() -> Set[str]:
+    """Keys known to exist: loaded from S3_MANIFEST, plus everything put by this process."""
+    global _known
+    with _known_lock:
+        if _known is None:
+            _known = set()
+            if S3_MANIFEST and os.path.exists(S3_MANIFEST):
+                with open(S3_MANIFEST, "r", encoding="utf-8") as f:
+                    _known.update(line.strip() for line in f if line.strip())
+        return _known
+
+def _remember(keys: List[str]):
+    if not keys:
+        return
+    known = _known_keys()
+    with _known_lock:
+        fresh = [k for k in keys if k not in known]
+        known.update(fresh)
+        if S3_MANIFEST and fresh:
+            with open(S3_MANIFEST, "a", encoding="utf-8") as f:
+                f.write("".join(k + "\n" for k in fresh))
+
+def exists(key: str) -> bool:
+    if key in _known_keys():
+        return True
+    try:
+        _client().head_object(Bucket=S3_BUCKET, Key=key)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return False
+        raise
+    _remember([key])
+    return True
 
 def put_bytes(key: str, data: bytes, content_type: str = "application/octet-stream"):
     if not S3_BUCKET:
@@ -29,6 +84,7 @@ def put_bytes(key: str, data: bytes, content_type: str = "application/octet-stre
         return
     c = _client()
     c.put_object(Bucket=S3_BUCKET, Key=key, Body=data, ContentType=content_type)
+    _remember([key])
     logger.info(f"[S3] Put s3://{S3_BUCKET}/{key}")
 
 def get_bytes(key: str) -> Optional[bytes]:
@@ -39,6 +95,99 @@ def get_bytes(key: str) -> Optional[bytes]:
     try:
         r = c.get_object(Bucket=S3_BUCKET, Key=key)
         return r["Body"].read()
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            logger.debug("[S3] No such key %s", key)
+        else:
+            logger.warning(f"[S3] Get failed for {key}: {e}")
+        return None
     except Exception as e:
         logger.warning(f"[S3] Get failed for {key}: {e}")
         return None
+
+def get_range(key: str, start: int, end: int) -> Optional[bytes]:
+    """Bytes [start, end) of an object via an HTTP Range request; None on failure."""
+    if not S3_BUCKET:
+        logger.warning("[S3] No bucket configured; skipping get for %s", key)
+        return None
+    if end <= start:
+        return b""
+    try:
+        r = _client().get_object(Bucket=S3_BUCKET, Key=key, Range=f"bytes={start}-{end - 1}")
+        return r["Body"].read()
+    except Exception as e:
+        logger.warning(f"[S3] Range get failed for {key} [{start}:{end}]: {e}")
+        return None
+
+def upload_file(path: str, key: str, content_type: str = "application/octet-stream") -> bool:
+    """Stream a local file to an object (multipart for large files)."""
+    if not S3_BUCKET:
+        logger.warning("[S3] No bucket configured; skipping put for %s", key)
+        return False
+    try:
+        _client().upload_file(path, S3_BUCKET, key, ExtraArgs={"ContentType": content_type})
+    except Exception as e:
+        logger.warning(f"[S3] Upload failed for {key}: {e}")
+        return False
+    _remember([key])
+    logger.info(f"[S3] Put s3://{S3_BUCKET}/{key}")
+    return True
+
+def download_file(key: str, path: str) -> bool:
+    """Stream an object to a local file (multipart, parallel ranges for large objects)."""
+    if not S3_BUCKET:
+        logger.warning("[S3] No bucket configured; skipping get for %s", key)
+        return False
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        _client().download_file(S3_BUCKET, key, tmp)
+        os.replace(tmp, path)
+        return True
+    except Exception as e:
+        logger.warning(f"[S3] Download failed for {key}: {e}")
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        return False
+
+def put_many(items: Iterable[Tuple[str, bytes, str]], skip_existing: bool = False,
+             workers: int = S3_MAX_CONCURRENCY) -> Dict[str, str]:
+    """
+    Upload (key, data, content_type) items on a bounded thread pool sharing one
+    client. With skip_existing (for content-addressed keys) a key already in the
+    manifest or found by HEAD is not uploaded again. Failures are logged, not
+    raised. Returns {key: "put" | "skipped" | "failed"} ({} without a bucket).
+    """
+    items = list(items)
+    if not S3_BUCKET:
+        if items:
+            logger.warning("[S3] No bucket configured; skipping %d puts", len(items))
+        return {}
+    if not items:
+        return {}
+    c = _client()
+
+    def one(item) -> str:
+        key, data, content_type = item
+        try:
+            if skip_existing and exists(key):
+                return "skipped"
+            c.put_object(Bucket=S3_BUCKET, Key=key, Body=data, ContentType=content_type)
+            return "put"
+        except Exception as e:
+            logger.warning(f"[S3] Put failed for {key}: {e}")
+            return "failed"
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(items))), thread_name_prefix="s3") as pool:
+        results = dict(zip((it[0] for it in items), pool.map(one, items)))
+    _remember([k for k, r in results.items() if r == "put"])
+    counts = {r: sum(1 for v in results.values() if v == r) for r in ("put", "skipped", "failed")}
+    logger.info(f"[S3] put_many s3://{S3_BUCKET}: {counts}")
+    return results
+
+def get_many(keys: Iterable[str], workers: int = S3_MAX_CONCURRENCY) -> Dict[str, Optional[bytes]]:
+    """Fetch many keys in parallel; missing or failed keys map to None."""
+    keys = list(dict.fromkeys(keys))
+    if not keys:
+        return {}
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(keys))), thread_name_prefix="s3") as pool:
+        return dict(zip(keys, pool.map(get_bytes, keys)))
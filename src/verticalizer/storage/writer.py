@@ -0,0 +1,163 @@
+# src/verticalizer/storage/writer.py
+import atexit
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from .repositories import write_crawl_batch
+
+logger = logging.getLogger(__name__)
+
+class CrawlWriter:
+    """
+    Buffers the crawler's writes (sites, crawls rows, validators, unchanged markers)
+    and flushes them with write_crawl_batch once `max_rows` items are pending or the
+    oldest pending item is `max_age` seconds old (checked on every add and by a
+    background timer, so a quiet writer still flushes on time). Thread-safe; use it
+    as a context manager, or rely on the atexit hook, so nothing buffered is lost
+    on exit.
+
+    A flush swaps the buffers out under the lock and writes outside it, so adders
+    never wait on the database. If a batch is rejected, its items are retried one
+    at a time and any item that still fails is logged and dropped, so one bad row
+    costs only itself; the (site, url) of every dropped page is kept in
+    `dropped_jobs` so callers can retry those pages.
+    """
+
+    def __init__(self, max_rows: int = 500, max_age: float = 5.0):
+        self.max_rows = max(1, max_rows)
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()  # one flush at a time, in buffer order
+        self._sites: Set[str] = set()
+        self._crawls: List[Dict] = []
+        self._validators: List[Dict] = []
+        self._unchanged: List[Tuple[str, str]] = []
+        self._oldest: Optional[float] = None
+        self.flushes = 0
+        self.rows = 0
+        self.dropped = 0
+        self.dropped_jobs: Set[Tuple[str, str]] = set()
+        self._stop = threading.Event()
+        self._timer = threading.Thread(target=self._run_timer, name="crawl-writer", daemon=True)
+        self._timer.start()
+        atexit.register(self.flush)
+
+    def __enter__(self) -> "CrawlWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _pending(self) -> int:
+        return len(self._sites) + len(self._crawls) + len(self._validators) + len(self._unchanged)
+
+    def _due(self) -> bool:
+        """Call with self._lock held, after adding an item."""
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+        return self._pending() >= self.max_rows or time.monotonic() - self._oldest >= self.max_age
+
+    def _run_timer(self):
+        while not self._stop.wait(max(0.05, self.max_age / 2)):
+            with self._lock:
+                due = self._oldest is not None and time.monotonic() - self._oldest >= self.max_age
+            if due:
+                try:
+                    self.flush(block=False)
+                except Exception as e:  # keep the timer alive; the next add or close retries
+                    logger.warning("CRAWL writer: timed flush failed: %s", e)
+
+    def add_site(self, site: str):
+        with self._lock:
+            self._sites.add(site)
+            due = self._due()
+        if due:
+            self.flush(block=False)
+
+    def add_crawl(self, row: Dict):
+        """`row` carries the record_crawl keyword arguments."""
+        if row.get("textexcerpt"):
+            row = dict(row, textexcerpt=row["textexcerpt"].replace("\x00", ""))  # Postgres TEXT rejects NUL
+        with self._lock:
+            self._crawls.append(row)
+            due = self._due()
+        if due:
+            self.flush(block=False)
+
+    def add_validators(self, url: str, site: str, etag: Optional[str], lastmodified: Optional[str],
+                       contenthash: str):
+        with self._lock:
+            self._validators.append({"url": url, "site": site, "etag": etag,
+                                     "lastmodified": lastmodified, "contenthash": contenthash})
+            due = self._due()
+        if due:
+            self.flush(block=False)
+
+    def mark_unchanged(self, site: str, url: str):
+        with self._lock:
+            self._unchanged.append((site, url))
+            due = self._due()
+        if due:
+            self.flush(block=False)
+
+    def flush(self, block: bool = True):
+        """
+        Write everything buffered. With block=False (the add_* path) the call returns
+        at once if another thread is already flushing; that flush's caller or the
+        next add picks up what is left.
+        """
+        if not self._write_lock.acquire(blocking=block):
+            return
+        try:
+            with self._lock:
+                if not self._pending():
+                    self._oldest = None
+                    return
+                sites, crawls = sorted(self._sites), self._crawls
+                validators, unchanged = self._validators, self._unchanged
+                self._sites, self._crawls, self._validators, self._unchanged = set(), [], [], []
+                self._oldest = None
+            try:
+                write_crawl_batch(sites, crawls, validators, unchanged)
+                written = len(crawls)
+            except Exception as e:
+                logger.warning("CRAWL writer: batch of %d crawl rows rejected (%s); retrying row by row",
+                               len(crawls), e)
+                written = self._write_one_by_one(sites, crawls, validators, unchanged)
+            self.flushes += 1
+            self.rows += written
+        finally:
+            self._write_lock.release()
+
+    def _write_one_by_one(self, sites: List[str], crawls: List[Dict], validators: List[Dict],
+                          unchanged: List[Tuple[str, str]]) -> int:
+        """Retry a rejected batch item by item (sites first, for the FKs); returns crawl rows written."""
+        written = 0
+        items: List[Tuple[List[str], List[Dict], List[Dict], List[Tuple[str, str]]]] = []
+        items += [([s], [], [], []) for s in sites]
+        items += [([], [c], [], []) for c in crawls]
+        items += [([], [], [v], []) for v in validators]
+        items += [([], [], [], [u]) for u in unchanged]
+        for args in items:
+            try:
+                write_crawl_batch(*args)
+                written += len(args[1])
+            except Exception as e:
+                self.dropped += 1
+                item = next(x for x in args if x)[0]
+                if isinstance(item, dict):
+                    item = (item["site"], item["url"])
+                if isinstance(item, tuple):
+                    self.dropped_jobs.add(item)
+                logger.error("CRAWL writer: dropping %s: %s", item, e)
+        return written
+
+    def close(self):
+        self._stop.set()
+        self._timer.join()
+        self.flush()
+        atexit.unregister(self.flush)
+        logger.info("CRAWL writer: %d crawl rows in %d flushes (%d items dropped)",
+                    self.rows, self.flushes, self.dropped)
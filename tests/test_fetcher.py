@@ -0,0 +1,80 @@
+import codecs
+import io
+from typing import Optional
+
+import pytest
+from verticalizer.crawl.fetcher import _read_capped, _sniff_charset, fetch_stats
+
+
+class FakeResponse:
+    """The slice of a streamed requests.Response that _read_capped uses."""
+
+    def __init__(self, body: bytes, content_type: str = "text/html", chunk: int = 4,
+                 content_length: Optional[int] = None):
+        self._body = body
+        self._chunk = chunk
+        self.url = "https://example.test/"
+        self.headers = {"Content-Type": content_type}
+        if content_length is not None:
+            self.headers["Content-Length"] = str(content_length)
+        self.raw = io.BytesIO(body)
+
+    def iter_content(self, chunk_size: int):
+        while True:
+            data = self.raw.read(self._chunk)
+            if not data:
+                return
+            yield data
+
+
+def _delta(before, after):
+    return {k: after[k] - before[k] for k in before}
+
+
+def test_read_capped_body_of_exactly_max_bytes_is_not_truncated():
+    before = fetch_stats()
+    html = _read_capped(FakeResponse(b"<p>hello</p>"), max_bytes=12)
+    assert html == "<p>hello</p>"
+    assert _delta(before, fetch_stats()) == {"pages": 1, "bytesRead": 12, "bytesSaved": 0,
+                                             "truncated": 0, "skippedNonHtml": 0}
+
+
+def test_read_capped_truncates_and_counts_bytes_not_downloaded():
+    body = b"x" * 100
+    before = fetch_stats()
+    html = _read_capped(FakeResponse(body, chunk=8, content_length=len(body)), max_bytes=20)
+    assert html == "x" * 20
+    delta = _delta(before, fetch_stats())
+    assert delta["truncated"] == 1
+    assert delta["bytesRead"] == 20
+    assert delta["bytesSaved"] == 100 - 24  # three 8-byte chunks came off the wire
+
+
+def test_read_capped_decodes_with_the_header_charset():
+    body = "<p>café</p>".encode("latin-1")
+    html = _read_capped(FakeResponse(body, content_type="text/html; charset=ISO-8859-1"), max_bytes=1000)
+    assert html == "<p>café</p>"
+
+
+@pytest.mark.parametrize("ctype, head, expected", [
+    ("text/html", codecs.BOM_UTF8 + b"<html>", "utf-8"),
+    ("text/html", codecs.BOM_UTF16_LE + "<html>".encode("utf-16-le"), "utf-16"),
+    ("text/html; charset=ISO-8859-1", b"<html>", "iso8859-1"),
+    ('text/html; charset="windows-1252"', b"<html>", "cp1252"),
+    ("text/html", b'<head><meta charset="shift_jis"></head>', "shift_jis"),
+    ("text/html", b'<meta http-equiv="Content-Type" content="text/html; charset=koi8-r">', "koi8-r"),
+    ("text/html", b"<html><body>plain</body></html>", "utf-8"),
+])
+def test_sniff_charset(ctype, head, expected):
+    assert _sniff_charset(ctype, head) == expected
+
+
+def test_sniff_charset_prefers_bom_then_header_then_meta():
+    meta = b'<meta charset="koi8-r">'
+    assert _sniff_charset("text/html; charset=latin-1", codecs.BOM_UTF8 + meta) == "utf-8"
+    assert _sniff_charset("text/html; charset=latin-1", meta) == "iso8859-1"
+
+
+def test_sniff_charset_skips_unknown_encodings():
+    assert _sniff_charset("text/html; charset=bogus", b'<meta charset="koi8-r">') == "koi8-r"
+    assert _sniff_charset("text/html; charset=bogus", b"<html>") == "utf-8"